@@ -11,6 +11,7 @@ from fastapi.middleware.cors import CORSMiddleware
 import jwt
 import logging
 import arq
+from redis.asyncio import Redis
 from opentelemetry.instrumentation.fastapi import FastAPIInstrumentor
 from core.limits_utils import check_and_increment_limits
 from core.models.request import GenerateUriRequest, RetrieveRequest, CompletionQueryRequest, IngestTextRequest, CreateGraphRequest, UpdateGraphRequest, BatchIngestResponse
@@ -101,25 +102,24 @@ async def initialize_database():
 @app.on_event("startup")
 async def initialize_vector_store():
     """Initialize vector store tables and indexes on application startup."""
-    # First initialize the primary vector store (PGVectorStore if using pgvector)
+    global vector_store
+    # First initialize the primary vector store (PGVectorStore if using pgvector).
+    # create() initializes the schema and opens the pool's connections up front,
+    # and the ready store replaces the placeholder the document service was built with.
     logger.info("Initializing primary vector store...")
-    if hasattr(vector_store, 'initialize'):
-        success = await vector_store.initialize()
-        if success:
-            logger.info("Primary vector store initialization successful")
-        else:
-            logger.error("Primary vector store initialization failed")
-    else:
-        logger.warning("Primary vector store does not have an initialize method")
+    try:
+        placeholder = vector_store
+        vector_store = await PGVectorStore.create(uri=settings.POSTGRES_URI)
+        document_service.vector_store = vector_store
+        await placeholder.close()
+        logger.info("Primary vector store initialization successful")
+    except Exception as e:
+        logger.error(f"Primary vector store initialization failed: {str(e)}")
     
     # Then initialize the multivector store if enabled
     if settings.ENABLE_COLPALI and colpali_vector_store:
         logger.info("Initializing multivector store...")
-        # Handle both synchronous and asynchronous initialize methods
-        if hasattr(colpali_vector_store.initialize, '__awaitable__'):
-            success = await colpali_vector_store.initialize()
-        else:
-            success = colpali_vector_store.initialize()
+        success = await colpali_vector_store.initialize()
             
         if success:
             logger.info("Multivector store initialization successful")
@@ -166,11 +166,21 @@ async def close_redis_pool():
         await redis_pool.wait_closed()
         logger.info("Redis connection pool closed")
 
+@app.on_event("shutdown")
+async def close_vector_stores():
+    """Close the vector store connection pools on application shutdown."""
+    logger.info("Closing vector store connections...")
+    await vector_store.close()
+    if colpali_vector_store:
+        await colpali_vector_store.close()
+    logger.info("Vector store connections closed")
+
 # Initialize vector store
 if not settings.POSTGRES_URI:
     raise ValueError("PostgreSQL URI is required for pgvector store")
 from core.vector_store.pgvector_store import PGVectorStore
 
+# Placeholder until startup replaces it with a store from PGVectorStore.create()
 vector_store = PGVectorStore(
     uri=settings.POSTGRES_URI,
 )
@@ -243,7 +253,18 @@ cache_factory = LlamaCacheFactory(Path(settings.STORAGE_PATH))
 # Initialize ColPali embedding model if enabled
 colpali_embedding_model = ColpaliEmbeddingModel() if settings.ENABLE_COLPALI else None
 colpali_vector_store = (
-    MultiVectorStore(uri=settings.POSTGRES_URI) if settings.ENABLE_COLPALI else None
+    MultiVectorStore(
+        uri=settings.POSTGRES_URI,
+        cache=(
+            Redis(host=settings.REDIS_HOST, port=settings.REDIS_PORT)
+            if settings.REDIS_QUERY_CACHE_TTL > 0
+            else None
+        ),
+        cache_ttl=settings.REDIS_QUERY_CACHE_TTL,
+        prefilter_factor=settings.COLPALI_PREFILTER_FACTOR,
+    )
+    if settings.ENABLE_COLPALI
+    else None
 )
 
 # Initialize document service with configured components
@@ -93,9 +93,14 @@ class Settings(BaseSettings):
     # Vector store configuration
     VECTOR_STORE_PROVIDER: Literal["pgvector"]
     VECTOR_STORE_DATABASE_NAME: Optional[str] = None
+    VECTOR_QUERY_CACHE_SIZE: int = 0
+    VECTOR_QUERY_CACHE_TTL: int = 0
+    VECTOR_DIMENSION_CHANGE_POLICY: Literal["abort", "recreate"] = "abort"
+    VECTOR_CONVERT_TO_HALFVEC: bool = False
 
     # Colpali configuration
     ENABLE_COLPALI: bool
+    COLPALI_PREFILTER_FACTOR: int = 0
     
     # Mode configuration     
     MODE: Literal["cloud", "self_hosted"] = "cloud"
@@ -106,6 +111,7 @@ class Settings(BaseSettings):
     # Redis configuration
     REDIS_HOST: str = "localhost"
     REDIS_PORT: int = 6379
+    REDIS_QUERY_CACHE_TTL: int = 0
     
     # Telemetry configuration
     TELEMETRY_ENABLED: bool = True
@@ -263,7 +269,13 @@ def get_settings() -> Settings:
             raise ValueError(f"Unknown storage provider selected: '{prov}'")
 
     # load vector store config
-    vector_store_config = {"VECTOR_STORE_PROVIDER": config["vector_store"]["provider"]}
+    vector_store_config = {
+        "VECTOR_STORE_PROVIDER": config["vector_store"]["provider"],
+        "VECTOR_QUERY_CACHE_SIZE": config["vector_store"].get("query_cache_size", 0),
+        "VECTOR_QUERY_CACHE_TTL": config["vector_store"].get("query_cache_ttl", 0),
+        "VECTOR_DIMENSION_CHANGE_POLICY": config["vector_store"].get("dimension_change_policy", "abort"),
+        "VECTOR_CONVERT_TO_HALFVEC": config["vector_store"].get("convert_to_halfvec", False),
+    }
     if vector_store_config["VECTOR_STORE_PROVIDER"] != "pgvector":
         prov = vector_store_config["VECTOR_STORE_PROVIDER"]
         raise ValueError(f"Unknown vector store provider selected: '{prov}'")
@@ -288,6 +300,7 @@ def get_settings() -> Settings:
     # load morphik config
     morphik_config = {
         "ENABLE_COLPALI": config["morphik"]["enable_colpali"],
+        "COLPALI_PREFILTER_FACTOR": config["morphik"].get("colpali_prefilter_factor", 0),
         "MODE": config["morphik"].get("mode", "cloud"),  # Default to "cloud" mode
         "API_DOMAIN": config["morphik"].get("api_domain", "api.morphik.ai"),  # Default API domain
     }
@@ -298,6 +311,7 @@ def get_settings() -> Settings:
         redis_config = {
             "REDIS_HOST": config["redis"].get("host", "localhost"),
             "REDIS_PORT": int(config["redis"].get("port", 6379)),
+            "REDIS_QUERY_CACHE_TTL": int(config["redis"].get("query_cache_ttl", 0)),
         }
 
     # load graph config
@@ -48,10 +48,11 @@ async def vector_store():
 
     try:
         # Initialize the database
-        store.initialize()
+        await store.initialize()
 
         # Clean up any existing data
-        store.conn.execute("TRUNCATE TABLE multi_vector_embeddings RESTART IDENTITY")
+        async with store.get_connection() as conn:
+            await conn.execute("TRUNCATE TABLE multi_vector_embeddings RESTART IDENTITY")
     except Exception as e:
         logger.error(f"Error setting up database: {e}")
         pytest.skip(f"Database setup failed: {e}")
@@ -60,12 +61,13 @@ async def vector_store():
 
     # Clean up after tests
     try:
-        store.conn.execute("TRUNCATE TABLE multi_vector_embeddings RESTART IDENTITY")
+        async with store.get_connection() as conn:
+            await conn.execute("TRUNCATE TABLE multi_vector_embeddings RESTART IDENTITY")
     except Exception as e:
         logger.error(f"Error cleaning up: {e}")
 
     # Close connection
-    store.close()
+    await store.close()
 
 
 async def process_pdf_pages(pdf_path, embedding_model, vector_store):
@@ -454,7 +456,8 @@ async def test_image_variations_robustness(pdf_path, embedding_model, vector_sto
 
     # Process original images first
     await vector_store.initialize()
-    vector_store.conn.execute("TRUNCATE TABLE multi_vector_embeddings RESTART IDENTITY")
+    async with vector_store.get_connection() as conn:
+        await conn.execute("TRUNCATE TABLE multi_vector_embeddings RESTART IDENTITY")
 
     # Store original images
     original_chunks = []
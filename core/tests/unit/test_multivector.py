@@ -2,9 +2,14 @@ import pytest
 import asyncio
 import torch
 import numpy as np
-from pgvector.psycopg import Bit
 import logging
-from core.vector_store.multi_vector_store import MultiVectorStore
+import psycopg
+from redis.exceptions import ConnectionError as RedisConnectionError
+from core.vector_store.multi_vector_store import (
+    QUERY_CACHE_GENERATION_KEY,
+    QUERY_CACHE_PREFIX,
+    MultiVectorStore,
+)
 from core.models.chunk import DocumentChunk
 from core.tests import setup_test_logging
 
@@ -57,16 +62,11 @@ async def vector_store():
 
     try:
         # Try to initialize the database
-        store.initialize()
+        await store.initialize()
 
         # Clean up any existing data
-        store.conn.execute("TRUNCATE TABLE multi_vector_embeddings RESTART IDENTITY")
-
-        # Drop the function if it exists
-        try:
-            store.conn.execute("DROP FUNCTION IF EXISTS max_sim(bit[], bit[])")
-        except Exception as e:
-            print(f"Error dropping function: {e}")
+        async with store.get_connection() as conn:
+            await conn.execute("TRUNCATE TABLE multi_vector_embeddings RESTART IDENTITY")
     except Exception as e:
         print(f"Error setting up database: {e}")
 
@@ -74,12 +74,13 @@ async def vector_store():
 
     # Clean up after tests
     try:
-        store.conn.execute("TRUNCATE TABLE multi_vector_embeddings RESTART IDENTITY")
+        async with store.get_connection() as conn:
+            await conn.execute("TRUNCATE TABLE multi_vector_embeddings RESTART IDENTITY")
     except Exception as e:
         print(f"Error cleaning up: {e}")
 
     # Close connection
-    store.close()
+    await store.close()
 
 
 # Glassbox Tests - Testing internal implementation details
@@ -91,43 +92,95 @@ async def test_binary_quantize():
     # Test with torch tensor
     torch_embeddings = torch.tensor([[0.1, -0.2, 0.3], [-0.1, 0.2, -0.3]])
     binary_result = store._binary_quantize(torch_embeddings)
-    assert len(binary_result) == 2
+    assert binary_result.shape == (2, 1)
 
-    # Check results match expected patterns
-    assert (
-        binary_result[0].to_text() == Bit("101").to_text()
-    )  # Positive values (>0) become 1, negative/zero become 0
-    assert (
-        binary_result[1].to_text() == Bit("010").to_text()
-    )  # First row: [0.1 (>0), -0.2 (<0), 0.3 (>0)] → "101"
-    # Second row: [-0.1 (<0), 0.2 (>0), -0.3 (<0)] → "010"
+    # Positive values (>0) become 1, negative/zero become 0, packed MSB first
+    # First row: [0.1 (>0), -0.2 (<0), 0.3 (>0)] → "101" → 0b10100000
+    # Second row: [-0.1 (<0), 0.2 (>0), -0.3 (<0)] → "010" → 0b01000000
+    assert binary_result.tobytes() == bytes([0b10100000, 0b01000000])
 
     # Test with numpy array
     numpy_embeddings = np.array([[0.1, -0.2, 0.3], [-0.1, 0.2, -0.3]])
     binary_result = store._binary_quantize(numpy_embeddings)
-    assert len(binary_result) == 2
+    assert binary_result.shape == (2, 1)
+    assert binary_result.tobytes() == bytes([0b10100000, 0b01000000])
+
+    # Already-binarized bool / uint8 input packs the same way
+    binary_result = store._binary_quantize(np.array([[1, 0, 1], [0, 1, 0]], dtype=np.uint8))
+    assert binary_result.tobytes() == bytes([0b10100000, 0b01000000])
+    binary_result = store._binary_quantize(np.array([[True, False, True], [False, True, False]]))
+    assert binary_result.tobytes() == bytes([0b10100000, 0b01000000])
 
-    assert binary_result[0].to_text() == Bit("101").to_text()
-    assert binary_result[1].to_text() == Bit("010").to_text()
+    # 128-dim tokens pack into 16 contiguous bytes each
+    binary_result = store._binary_quantize(get_sample_embeddings(3, 128))
+    assert binary_result.shape == (3, 16)
+    assert len(binary_result.tobytes()) == 48
+
+    # An empty token list packs to no rows instead of failing
+    binary_result = store._binary_quantize([])
+    assert binary_result.shape == (0, 0)
+    assert binary_result.tobytes() == b""
+
+
+@pytest.mark.asyncio
+async def test_binary_quantize_tensor_matches_numpy():
+    """Test that the on-device torch packing produces the same bytes as np.packbits"""
+    store = MultiVectorStore(uri=TEST_DB_URI)
+    generator = torch.Generator().manual_seed(0)
+
+    # Dimensions that are and are not multiples of 8 exercise the zero padding
+    for num_tokens, dim in [(1, 8), (5, 128), (7, 130), (3, 3)]:
+        embeddings = torch.rand(num_tokens, dim, generator=generator) * 2 - 1
+        # Include exact zeros, which must quantize to 0 on both paths
+        embeddings[0, 0] = 0.0
+        expected = store._binary_quantize(embeddings.numpy())
+
+        torch_result = store._binary_quantize(embeddings)
+        assert torch_result.dtype == np.uint8
+        assert torch_result.shape == expected.shape == (num_tokens, (dim + 7) // 8)
+        assert torch_result.tobytes() == expected.tobytes()
+
+        # A list of per-token tensors is stacked and packed the same way
+        assert store._binary_quantize(list(embeddings)).tobytes() == expected.tobytes()
+
+    # A single 1-D token is treated as one row on both paths
+    token = torch.rand(130, generator=generator) * 2 - 1
+    assert store._binary_quantize(token).tobytes() == store._binary_quantize(token.numpy()).tobytes()
+
+
+@pytest.mark.asyncio
+async def test_summarize_tokens():
+    """Test that token summaries keep the per-bit majority across tokens"""
+    store = MultiVectorStore(uri=TEST_DB_URI)
+
+    embeddings = np.array([[0.1, -0.2, 0.3], [0.1, 0.2, -0.3], [-0.1, -0.2, 0.3]])
+    summary = store._summarize_tokens(store._binary_quantize(embeddings))
+
+    # Bits set in at least half of the tokens survive: "101" → 0b10100000
+    assert summary.tobytes() == bytes([0b10100000])
 
 
 @pytest.mark.asyncio
 async def test_initialize_creates_tables_and_function(vector_store):
     """Test that initialize creates the necessary tables and functions"""
-    vector_store.initialize()
+    await vector_store.initialize()
     # Check if the table exists
-    result = vector_store.conn.execute(
-        "SELECT EXISTS (SELECT FROM information_schema.tables WHERE table_name = 'multi_vector_embeddings')"
-    ).fetchone()
+    async with vector_store.get_connection() as conn:
+        cur = await conn.execute(
+            "SELECT EXISTS (SELECT FROM information_schema.tables WHERE table_name = 'multi_vector_embeddings')"
+        )
+        result = await cur.fetchone()
     table_exists = result[0]
     assert table_exists is True
 
     logger.info("Table exists!")
 
     # Check if the max_sim function exists
-    result = vector_store.conn.execute(
-        "SELECT EXISTS (SELECT FROM pg_proc WHERE proname = 'max_sim')"
-    ).fetchone()
+    async with vector_store.get_connection() as conn:
+        cur = await conn.execute(
+            "SELECT EXISTS (SELECT FROM pg_proc WHERE proname = 'max_sim')"
+        )
+        result = await cur.fetchone()
     function_exists = result[0]
     logger.info(f"Function exists {function_exists}")
     assert function_exists is True
@@ -137,10 +190,12 @@ async def test_initialize_creates_tables_and_function(vector_store):
 async def test_database_schema(vector_store):
     """Test that the database schema matches our expectations"""
     # Check columns in the table
-    result = vector_store.conn.execute(
-        "SELECT column_name, data_type FROM information_schema.columns "
-        "WHERE table_name = 'multi_vector_embeddings'"
-    ).fetchall()
+    async with vector_store.get_connection() as conn:
+        cur = await conn.execute(
+            "SELECT column_name, data_type FROM information_schema.columns "
+            "WHERE table_name = 'multi_vector_embeddings'"
+        )
+        result = await cur.fetchall()
 
     # Convert to a dict for easier checking
     column_dict = {col[0]: col[1] for col in result}
@@ -151,13 +206,24 @@ async def test_database_schema(vector_store):
     assert "chunk_number" in column_dict
     assert "content" in column_dict
     assert "embeddings" in column_dict
+    assert "num_tokens" in column_dict
+    assert column_dict["chunk_metadata"] == "jsonb"
+
+    # Check the composite lookup index replaced the single-column one
+    async with vector_store.get_connection() as conn:
+        cur = await conn.execute(
+            "SELECT indexname FROM pg_indexes WHERE tablename = 'multi_vector_embeddings'"
+        )
+        indexes = {row[0] for row in await cur.fetchall()}
+    assert "idx_mv_doc_chunk" in indexes
+    assert "idx_multi_vector_document_id" not in indexes
 
 
 # Blackbox Tests - Testing the public API
 @pytest.mark.asyncio
 async def test_store_and_query_embeddings(vector_store):
     """End-to-end test of storing and querying embeddings"""
-    vector_store.initialize()
+    await vector_store.initialize()
     # Create test data
     chunks = get_sample_document_chunks(num_chunks=5, num_vectors=3, dim=128)
 
@@ -189,7 +255,7 @@ async def test_store_and_query_embeddings(vector_store):
 @pytest.mark.asyncio
 async def test_query_with_doc_ids(vector_store):
     """Test querying with document ID filtering"""
-    vector_store.initialize()
+    await vector_store.initialize()
     # Create test data
     chunks = get_sample_document_chunks(num_chunks=5, num_vectors=3, dim=128)
 
@@ -210,16 +276,161 @@ async def test_query_with_doc_ids(vector_store):
 @pytest.mark.asyncio
 async def test_store_embeddings_empty(vector_store):
     """Test storing empty embeddings list"""
-    vector_store.initialize()
+    await vector_store.initialize()
     result, stored_ids = await vector_store.store_embeddings([])
     assert result is True
     assert stored_ids == []
 
 
+@pytest.mark.asyncio
+async def test_initialize_migrates_legacy_table(vector_store):
+    """Test that initialize converts BIT(128)[] embeddings and repr() TEXT metadata from older versions"""
+    chunks = get_sample_document_chunks(num_chunks=3, num_vectors=3, dim=128)
+    legacy_metadata = [repr(chunks[0].metadata), "{'unterminated': ", None]
+
+    try:
+        async with vector_store.get_connection() as conn:
+            await conn.execute("DROP TABLE multi_vector_embeddings")
+            await conn.execute(
+                """
+                CREATE TABLE multi_vector_embeddings (
+                    id BIGSERIAL PRIMARY KEY,
+                    document_id TEXT NOT NULL,
+                    chunk_number INTEGER NOT NULL,
+                    content TEXT NOT NULL,
+                    chunk_metadata TEXT,
+                    embeddings BIT(128)[]
+                )
+                """
+            )
+            for chunk, metadata in zip(chunks, legacy_metadata):
+                tokens = ["".join("1" if value > 0 else "0" for value in token) for token in chunk.embedding]
+                await conn.execute(
+                    "INSERT INTO multi_vector_embeddings (document_id, chunk_number, content, chunk_metadata, embeddings) "
+                    "VALUES (%s, %s, %s, %s, %s::bit(128)[])",
+                    (chunk.document_id, chunk.chunk_number, chunk.content, metadata, tokens),
+                )
+
+        assert await vector_store.initialize()
+
+        async with vector_store.get_connection() as conn:
+            cur = await conn.execute(
+                "SELECT column_name, udt_name FROM information_schema.columns "
+                "WHERE table_name = 'multi_vector_embeddings'"
+            )
+            column_types = dict(await cur.fetchall())
+            cur = await conn.execute(
+                "SELECT document_id, chunk_metadata, embeddings, num_tokens "
+                "FROM multi_vector_embeddings ORDER BY chunk_number"
+            )
+            rows = await cur.fetchall()
+
+        assert column_types["embeddings"] == "bytea"
+        assert column_types["chunk_metadata"] == "jsonb"
+        assert [row[1] for row in rows] == [chunks[0].metadata, {}, None]
+        for chunk, (document_id, _, embeddings, num_tokens) in zip(chunks, rows):
+            assert document_id == chunk.document_id
+            assert embeddings == vector_store._binary_quantize(chunk.embedding).tobytes()
+            assert num_tokens == 3
+
+        # Migrated rows are scored like newly stored ones
+        results = await vector_store.query_similar(chunks[1].embedding, k=3)
+        assert results[0].document_id == "doc_1"
+        assert results[0].score == pytest.approx(3.0)
+    finally:
+        # Let the next initialize() create the current schema from scratch
+        async with vector_store.get_connection() as conn:
+            await conn.execute("DROP TABLE IF EXISTS multi_vector_embeddings")
+
+
+@pytest.mark.asyncio
+async def test_store_embeddings_copy_fallback(vector_store, monkeypatch):
+    """Test that rows are inserted with executemany when the binary COPY fails"""
+    copy_attempts = []
+
+    async def failing_copy(conn, rows):
+        # A real server-side COPY failure, so the fallback runs on the same connection
+        copy_attempts.append(len(rows))
+        async with conn.cursor() as cur:
+            async with cur.copy("COPY multi_vector_embeddings (document_id) FROM STDIN WITH (FORMAT BINARY)") as copy:
+                await copy.write(b"not binary copy data")
+
+    monkeypatch.setattr(vector_store, "_copy_rows", failing_copy)
+    vector_store.batch_size = 2  # several executemany batches
+
+    chunks = get_sample_document_chunks(num_chunks=5, num_vectors=3, dim=128)
+    result, stored_ids = await vector_store.store_embeddings(chunks)
+    assert result is True
+    assert stored_ids == [f"doc_{i}-{i}" for i in range(5)]
+    assert copy_attempts == [5]
+
+    async with vector_store.get_connection() as conn:
+        cur = await conn.execute(
+            "SELECT document_id, chunk_number, content, chunk_metadata, embeddings, num_tokens "
+            "FROM multi_vector_embeddings ORDER BY chunk_number"
+        )
+        rows = await cur.fetchall()
+    assert len(rows) == 5
+    for chunk, (document_id, chunk_number, content, metadata, embeddings, num_tokens) in zip(chunks, rows):
+        packed = vector_store._binary_quantize(chunk.embedding)
+        assert (document_id, chunk_number, content) == (chunk.document_id, chunk.chunk_number, chunk.content)
+        assert metadata == chunk.metadata
+        assert embeddings == packed.tobytes()
+        assert num_tokens == 3
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize("max_sim_function", ["max_sim", "max_sim_bin"])
+@pytest.mark.parametrize("prefilter_factor", [0, 2])
+async def test_chunks_without_tokens(vector_store, max_sim_function, prefilter_factor):
+    """Test that chunks without tokens are rejected on store and never break ranking"""
+    await vector_store.initialize()
+    if max_sim_function == "max_sim_bin" and vector_store.max_sim_function != "max_sim_bin":
+        pytest.skip("morphik_max_sim extension is not installed")
+    vector_store.max_sim_function = max_sim_function
+    vector_store.prefilter_factor = prefilter_factor
+
+    chunks = get_sample_document_chunks(num_chunks=3, num_vectors=3, dim=128)
+    chunks[1].embedding = []
+    result, stored_ids = await vector_store.store_embeddings(chunks)
+    assert result is True
+    assert stored_ids == ["doc_0-0", "doc_2-2"]
+
+    # A token-less row written by an older version scores NULL and must be skipped
+    async with vector_store.get_connection() as conn:
+        await conn.execute(
+            "INSERT INTO multi_vector_embeddings (document_id, chunk_number, content, embeddings, num_tokens) "
+            "VALUES ('empty', 0, 'Empty content', ''::bytea, 0)"
+        )
+
+    results = await vector_store.query_similar(get_sample_embeddings(2, 128), k=5)
+    assert sorted(r.document_id for r in results) == ["doc_0", "doc_2"]
+    results = await vector_store.query_similar(get_sample_embeddings(2, 128), k=5, doc_ids=["empty", "doc_2"])
+    assert [r.document_id for r in results] == ["doc_2"]
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize("max_sim_function", ["max_sim", "max_sim_bin"])
+async def test_query_dimension_mismatch(vector_store, max_sim_function):
+    """Test that a query of another dimension is rejected rather than mis-scored"""
+    await vector_store.initialize()
+    if max_sim_function == "max_sim_bin" and vector_store.max_sim_function != "max_sim_bin":
+        pytest.skip("morphik_max_sim extension is not installed")
+    vector_store.max_sim_function = max_sim_function
+
+    # 16-byte stored tokens are evenly divisible by 8-byte query tokens
+    await vector_store.store_embeddings(get_sample_document_chunks(num_chunks=3, num_vectors=3, dim=128))
+    with pytest.raises(psycopg.errors.StringDataLengthMismatch):
+        await vector_store.query_similar(get_sample_embeddings(2, 64), k=3)
+
+    results = await vector_store.query_similar(get_sample_embeddings(2, 128), k=3)
+    assert len(results) == 3
+
+
 @pytest.mark.asyncio
 async def test_multi_vector_similarity(vector_store):
     """Test that multi-vector similarity works as expected"""
-    vector_store.initialize()
+    await vector_store.initialize()
     # Create chunks with very specific embeddings to test similarity
     chunks = []
 
@@ -261,10 +472,228 @@ async def test_multi_vector_similarity(vector_store):
     assert results[1].document_id == "similarity_test_2"
 
 
+def exact_max_sim(doc_embeddings, query_embeddings):
+    """Reference MaxSim over sign bits: sum over query tokens of the best 1 - hamming / dim."""
+    doc_bits = np.asarray(doc_embeddings) > 0
+    query_bits = np.asarray(query_embeddings) > 0
+    distances = (query_bits[:, None, :] != doc_bits[None, :, :]).sum(axis=2)
+    return float((1 - distances.min(axis=1) / query_bits.shape[1]).sum())
+
+
+@pytest.mark.asyncio
+async def test_prefilter_recall(vector_store):
+    """Test that the token-summary prefilter is opt-in and never beats the exact ranking"""
+    await vector_store.initialize()
+    assert vector_store.prefilter_factor == 0
+
+    chunks = get_sample_document_chunks(num_chunks=40, num_vectors=4, dim=128)
+    await vector_store.store_embeddings(chunks)
+    query_embedding = get_sample_embeddings(3, 128)
+    k = 5
+
+    exact = {chunk.document_id: exact_max_sim(chunk.embedding, query_embedding) for chunk in chunks}
+    expected_scores = sorted(exact.values(), reverse=True)[:k]
+
+    # The default query scores every chunk, so it returns the exact top k
+    results = await vector_store.query_similar(query_embedding, k=k)
+    assert [r.score for r in results] == pytest.approx(expected_scores)
+    for result in results:
+        assert result.score == pytest.approx(exact[result.document_id])
+
+    # Enabling the prefilter backfills the summaries it ranks candidates by; a
+    # candidate set covering every chunk gives the same answer as the full scan
+    vector_store.prefilter_factor = len(chunks)
+    assert await vector_store.initialize()
+    results = await vector_store.query_similar(query_embedding, k=k)
+    assert [r.score for r in results] == pytest.approx(expected_scores)
+
+    # A narrow candidate set may miss chunks, but what it returns is scored exactly
+    # and can only rank at or below the exact top k
+    vector_store.prefilter_factor = 1
+    results = await vector_store.query_similar(query_embedding, k=k)
+    assert len(results) == k
+    for result, expected in zip(results, expected_scores):
+        assert result.score == pytest.approx(exact[result.document_id])
+        assert result.score <= expected + 1e-9
+
+
+async def fetch_token_summaries(store):
+    async with store.get_connection() as conn:
+        cur = await conn.execute("SELECT document_id, token_summary FROM multi_vector_embeddings")
+        return dict(await cur.fetchall())
+
+
+@pytest.mark.asyncio
+async def test_token_summaries_follow_prefilter(vector_store):
+    """Test that summaries are only computed with the prefilter on, and backfilled when it is enabled"""
+    chunks = get_sample_document_chunks(num_chunks=5, num_vectors=3, dim=128)
+    await vector_store.store_embeddings(chunks[:3])
+    assert set((await fetch_token_summaries(vector_store)).values()) == {None}
+
+    vector_store.prefilter_factor = 2
+    vector_store.batch_size = 2  # several backfill batches
+    assert await vector_store.initialize()
+    await vector_store.store_embeddings(chunks[3:])
+
+    summaries = await fetch_token_summaries(vector_store)
+    assert len(summaries) == 5
+    for chunk in chunks:
+        packed = vector_store._binary_quantize(chunk.embedding)
+        assert summaries[chunk.document_id] == vector_store._summarize_tokens(packed).tobytes()
+
+
+@pytest.mark.asyncio
+async def test_max_sim_bin_matches_sql_max_sim(vector_store):
+    """Test that the C max_sim_bin kernel scores exactly like the SQL max_sim fallback"""
+    await vector_store.initialize()
+    if vector_store.max_sim_function != "max_sim_bin":
+        pytest.skip("morphik_max_sim extension is not installed")
+
+    # 25-byte tokens run through the 16-byte, 8-byte and single-byte popcount steps
+    chunks = get_sample_document_chunks(num_chunks=10, num_vectors=4, dim=200)
+    await vector_store.store_embeddings(chunks)
+    query_embedding = get_sample_embeddings(3, 200)
+    packed_query = vector_store._binary_quantize(query_embedding)
+    params = (packed_query.tobytes(), packed_query.shape[1]) * 2
+
+    async with vector_store.get_connection() as conn:
+        cur = await conn.execute(
+            """
+            SELECT document_id, max_sim(embeddings, %s, %s, num_tokens), max_sim_bin(embeddings, %s, %s, num_tokens)
+            FROM multi_vector_embeddings
+            """,
+            params,
+        )
+        rows = await cur.fetchall()
+
+    exact = {chunk.document_id: exact_max_sim(chunk.embedding, query_embedding) for chunk in chunks}
+    assert len(rows) == len(chunks)
+    for document_id, sql_score, c_score in rows:
+        assert c_score == pytest.approx(sql_score)
+        assert c_score == pytest.approx(exact[document_id])
+
+    # query_similar ranks the same way with either scoring function
+    c_results = await vector_store.query_similar(query_embedding, k=5)
+    vector_store.max_sim_function = "max_sim"
+    sql_results = await vector_store.query_similar(query_embedding, k=5)
+    assert [r.score for r in c_results] == pytest.approx([r.score for r in sql_results])
+
+
+class FakeRedis:
+    """In-memory stand-in for the redis.asyncio commands used by the query cache"""
+
+    def __init__(self):
+        self.data = {}
+        self.ttls = {}
+        self.fail = False
+
+    def _check(self):
+        if self.fail:
+            raise RedisConnectionError("redis is down")
+
+    async def get(self, key):
+        self._check()
+        return self.data.get(key)
+
+    async def setex(self, key, ttl, value):
+        self._check()
+        self.data[key] = value.encode() if isinstance(value, str) else value
+        self.ttls[key] = ttl
+
+    async def incr(self, key):
+        self._check()
+        self.data[key] = int(self.data.get(key, 0)) + 1
+        return self.data[key]
+
+
+def cached_query_keys(cache):
+    return [key for key in cache.data if key.startswith(QUERY_CACHE_PREFIX)]
+
+
+@pytest.fixture(scope="function")
+async def cached_vector_store(vector_store):
+    """The test store with a fake Redis query cache attached"""
+    vector_store.cache = FakeRedis()
+    vector_store.cache_ttl = 60
+    yield vector_store
+    vector_store.cache = None
+
+
+@pytest.mark.asyncio
+async def test_query_cache_hit(cached_vector_store):
+    """Test that a repeated query is served from the cache without touching the table"""
+    store = cached_vector_store
+    chunks = get_sample_document_chunks(num_chunks=5, num_vectors=3, dim=128)
+    await store.store_embeddings(chunks)
+    query_embedding = get_sample_embeddings(2, 128)
+
+    results = await store.query_similar(query_embedding, k=3)
+    assert len(results) == 3
+    keys = cached_query_keys(store.cache)
+    assert len(keys) == 1
+    assert store.cache.ttls[keys[0]] == 60
+
+    # Rows removed behind the store's back are still returned from the cache
+    async with store.get_connection() as conn:
+        await conn.execute("DELETE FROM multi_vector_embeddings")
+    cached = await store.query_similar(query_embedding, k=3)
+    assert [(c.document_id, c.chunk_number, c.score, c.content, c.metadata) for c in cached] == [
+        (r.document_id, r.chunk_number, r.score, r.content, r.metadata) for r in results
+    ]
+
+    # k and doc_ids are part of the key, so other queries still go to the database
+    assert await store.query_similar(query_embedding, k=2) == []
+    assert await store.query_similar(query_embedding, k=3, doc_ids=["doc_0"]) == []
+
+
+@pytest.mark.asyncio
+async def test_query_cache_invalidated_by_writes(cached_vector_store):
+    """Test that storing and deleting chunks bump the generation so cached results are not reused"""
+    store = cached_vector_store
+    chunks = get_sample_document_chunks(num_chunks=3, num_vectors=3, dim=128)
+    await store.store_embeddings(chunks)
+    generation = store.cache.data[QUERY_CACHE_GENERATION_KEY]
+
+    query_embedding = chunks[0].embedding
+    results = await store.query_similar(query_embedding, k=10)
+    assert {r.document_id for r in results} == {"doc_0", "doc_1", "doc_2"}
+
+    # A new chunk identical to the query must show up on the next query
+    new_chunk = DocumentChunk(
+        document_id="doc_new", content="New content", embedding=query_embedding, chunk_number=0
+    )
+    await store.store_embeddings([new_chunk])
+    assert store.cache.data[QUERY_CACHE_GENERATION_KEY] == generation + 1
+    results = await store.query_similar(query_embedding, k=10)
+    assert {r.document_id for r in results} == {"doc_0", "doc_1", "doc_2", "doc_new"}
+
+    # Deleting a document retires the cached result again
+    assert await store.delete_chunks_by_document_id("doc_new")
+    assert store.cache.data[QUERY_CACHE_GENERATION_KEY] == generation + 2
+    results = await store.query_similar(query_embedding, k=10)
+    assert {r.document_id for r in results} == {"doc_0", "doc_1", "doc_2"}
+    assert len(cached_query_keys(store.cache)) == 3
+
+
+@pytest.mark.asyncio
+async def test_query_cache_unavailable(cached_vector_store):
+    """Test that Redis errors fall back to querying PostgreSQL"""
+    store = cached_vector_store
+    store.cache.fail = True
+    chunks = get_sample_document_chunks(num_chunks=3, num_vectors=3, dim=128)
+
+    result, stored_ids = await store.store_embeddings(chunks)
+    assert result is True
+    results = await store.query_similar(chunks[0].embedding, k=3)
+    assert len(results) == 3
+    assert results[0].document_id == "doc_0"
+    assert store.cache.data == {}
+
+
 @pytest.mark.asyncio
 async def test_store_and_retrieve_metadata(vector_store):
     """Test that metadata is correctly stored and retrieved"""
-    vector_store.initialize()
+    await vector_store.initialize()
     # Create a chunk with complex metadata
     complex_metadata = {
         "filename": "test.pdf",
@@ -299,10 +728,32 @@ async def test_store_and_retrieve_metadata(vector_store):
     assert retrieved_metadata["nested"]["key1"] == "value1"
 
 
+@pytest.mark.asyncio
+async def test_get_chunks_by_id(vector_store):
+    """Test batch retrieval order, and that duplicate and unknown identifiers are handled"""
+    chunks = get_sample_document_chunks(num_chunks=4, num_vectors=2, dim=128)
+    await vector_store.store_embeddings(chunks)
+
+    retrieved = await vector_store.get_chunks_by_id(
+        [("doc_3", 3), ("doc_0", 0), ("missing", 0), ("doc_3", 3), ("doc_2", 99), ("doc_1", 1)]
+    )
+
+    assert [(chunk.document_id, chunk.chunk_number) for chunk in retrieved] == [
+        ("doc_3", 3),
+        ("doc_0", 0),
+        ("doc_1", 1),
+    ]
+    assert [chunk.content for chunk in retrieved] == [chunks[3].content, chunks[0].content, chunks[1].content]
+    assert retrieved[0].metadata == chunks[3].metadata
+    assert all(chunk.embedding == [] and chunk.score == 0.0 for chunk in retrieved)
+    assert await vector_store.get_chunks_by_id([]) == []
+    assert await vector_store.get_chunks_by_id([("missing", 0)]) == []
+
+
 @pytest.mark.asyncio
 async def test_performance(vector_store):
     """Test performance with a larger number of chunks"""
-    vector_store.initialize()
+    await vector_store.initialize()
     # Create a larger set of chunks
     num_chunks = 20
     chunks = get_sample_document_chunks(num_chunks=num_chunks, num_vectors=3, dim=128)
@@ -1,203 +1,370 @@
-from typing import List, Optional, Tuple, Union, ContextManager
+from typing import List, Optional, Tuple, Union
+import ast
+import asyncio
+import hashlib
+import json
 import logging
+import struct
 import torch
 import numpy as np
-import time
-from contextlib import contextmanager
+import orjson
+from contextlib import asynccontextmanager
 import psycopg
-from pgvector.psycopg import Bit, register_vector
+from psycopg.types.json import Jsonb, set_json_dumps, set_json_loads
+from psycopg_pool import AsyncConnectionPool, PoolTimeout
+from redis.asyncio import Redis
+from redis.exceptions import RedisError
 from core.models.chunk import DocumentChunk
 from .base_vector_store import BaseVectorStore
 
 logger = logging.getLogger(__name__)
 
+MULTI_VECTOR_COLUMNS = (
+    "document_id, chunk_number, content, chunk_metadata, embeddings, num_tokens, token_summary"
+)
+
+# Redis keys for the query_similar result cache. Every write bumps the generation,
+# which retires all cached results at once without scanning for keys.
+QUERY_CACHE_PREFIX = "multi_vector:query"
+QUERY_CACHE_GENERATION_KEY = "multi_vector:generation"
+
+# SQL fallback for max_sim_bin over packed token buffers. Document tokens are split by
+# their own width, so a query of another dimension fails in the XOR instead of being
+# scored against misaligned tokens.
+MAX_SIM_SQL = """
+CREATE OR REPLACE FUNCTION max_sim(
+    document bytea, query bytea, token_bytes integer, document_tokens integer
+) RETURNS double precision AS $$
+    WITH queries AS (
+        SELECT
+            query_number,
+            ('x' || encode(
+                substring(query FROM query_number * token_bytes + 1 FOR token_bytes), 'hex'
+            ))::varbit AS query
+        FROM generate_series(0, octet_length(query) / token_bytes - 1) AS query_number
+    ),
+    documents AS (
+        SELECT
+            ('x' || encode(
+                substring(document FROM document_number * document_bytes + 1 FOR document_bytes),
+                'hex'
+            ))::varbit AS document
+        FROM (
+            SELECT octet_length(document) / nullif(document_tokens, 0) AS document_bytes
+        ) AS width,
+            generate_series(0, document_tokens - 1) AS document_number
+    ),
+    similarities AS (
+        SELECT
+            query_number,
+            1.0 - (bit_count(document # query)::float / greatest(token_bytes * 8, 1)::float)
+                AS similarity
+        FROM queries CROSS JOIN documents
+    ),
+    max_similarities AS (
+        SELECT MAX(similarity) AS max_similarity FROM similarities GROUP BY query_number
+    )
+    SELECT SUM(max_similarity) FROM max_similarities
+$$ LANGUAGE SQL IMMUTABLE STRICT PARALLEL SAFE COST 1000
+"""
+
+
+def _dump_json(obj) -> bytes:
+    """Serialize chunk metadata for JSONB columns.
+
+    orjson writes numpy scalars and arrays natively; anything else it does not
+    know (e.g. datetimes inside user metadata) falls back to str().
+    """
+    return orjson.dumps(
+        obj, default=str, option=orjson.OPT_SERIALIZE_NUMPY | orjson.OPT_NON_STR_KEYS
+    )
+
 
 class MultiVectorStore(BaseVectorStore):
-    """PostgreSQL implementation for storing and querying multi-vector embeddings using psycopg."""
+    """PostgreSQL implementation for storing and querying multi-vector embeddings with psycopg."""
 
     def __init__(
         self,
         uri: str,
         max_retries: int = 3,
         retry_delay: float = 1.0,
+        batch_size: int = 500,
+        min_pool_size: int = 2,
+        max_pool_size: int = 16,
+        cache: Optional[Redis] = None,
+        cache_ttl: int = 600,
+        prefilter_factor: int = 0,
     ):
-        """Initialize PostgreSQL connection for multi-vector storage.
+        """Initialize PostgreSQL connection pool for multi-vector storage.
 
         Args:
             uri: PostgreSQL connection URI
-            max_retries: Maximum number of connection retry attempts
+            max_retries: Maximum number of attempts to acquire a connection
             retry_delay: Delay in seconds between retry attempts
+            batch_size: Number of rows sent per executemany call when COPY is unavailable
+            min_pool_size: Number of connections the pool keeps open
+            max_pool_size: Maximum number of concurrent connections to PostgreSQL
+            cache: Optional Redis client used to cache query_similar results
+            cache_ttl: Seconds a cached query_similar result stays valid
+            prefilter_factor: When > 0, query_similar fully scores only the k * prefilter_factor
+                chunks whose token summary matches the query best. The summary does not
+                bound the full score, so this trades recall for speed; 0 (the default)
+                scores every chunk exactly and skips computing summaries
         """
         # Convert SQLAlchemy URI to psycopg format if needed
         if uri.startswith("postgresql+asyncpg://"):
             uri = uri.replace("postgresql+asyncpg://", "postgresql://")
         self.uri = uri
-        self.conn = None
         self.max_retries = max_retries
         self.retry_delay = retry_delay
+        self.batch_size = batch_size
+        self.prefilter_factor = prefilter_factor
+        # Scoring function used by query_similar; switched to the C implementation
+        # by initialize() when the morphik_max_sim extension is installed
+        self.max_sim_function = "max_sim"
+        # Connections are reused across calls; the pool is opened on first use and
+        # reconnects in the background when PostgreSQL drops a connection
+        self.pool = AsyncConnectionPool(
+            self.uri,
+            min_size=min_pool_size,
+            max_size=max_pool_size,
+            kwargs={"autocommit": True},
+            configure=self._configure_connection,
+            open=False,
+        )
+        self.cache = cache
+        self.cache_ttl = cache_ttl
         # Don't initialize here - initialization will be handled separately
-        
-    @contextmanager
-    def get_connection(self):
-        """Get a PostgreSQL connection with retry logic.
-        
+
+    @staticmethod
+    async def _configure_connection(conn: psycopg.AsyncConnection) -> None:
+        """Session setup run once for every connection the pool opens.
+
+        Embeddings travel as bytea, so no pgvector adapters are needed here. JSONB
+        metadata is encoded and decoded with orjson, and JIT compilation, which
+        costs more than it saves on the short max_sim queries, is turned off.
+        Cheaper parallel setup makes the planner split max_sim scans across workers.
+        """
+        set_json_dumps(_dump_json, conn)
+        set_json_loads(orjson.loads, conn)
+        await conn.execute(
+            "SET jit = off; SET parallel_setup_cost = 100; SET parallel_tuple_cost = 0.01"
+        )
+
+    @asynccontextmanager
+    async def get_connection(self):
+        """Borrow a PostgreSQL connection from the pool with retry logic.
+
         Yields:
             A PostgreSQL connection object
-            
+
         Raises:
-            psycopg.OperationalError: If all connection attempts fail
+            psycopg_pool.PoolTimeout: If no connection could be acquired after all retries
         """
+        if self.pool.closed:
+            await self.pool.open()
+
         attempt = 0
-        last_error = None
-        
-        # Try to establish a new connection with retries
-        while attempt < self.max_retries:
+        while True:
             try:
-                # Always create a fresh connection for critical operations
-                conn = psycopg.connect(self.uri, autocommit=True)
-                # Register vector extension on every new connection
-                register_vector(conn)
-                
-                try:
-                    yield conn
-                    return
-                finally:
-                    # Always close connections after use
-                    try:
-                        conn.close()
-                    except Exception:
-                        pass
-            except psycopg.OperationalError as e:
-                last_error = e
+                conn = await self.pool.getconn()
+                break
+            except (PoolTimeout, psycopg.OperationalError) as e:
                 attempt += 1
-                if attempt < self.max_retries:
-                    logger.warning(f"Connection attempt {attempt} failed: {str(e)}. Retrying in {self.retry_delay} seconds...")
-                    time.sleep(self.retry_delay)
-        
-        # If we get here, all retries failed
-        logger.error(f"All connection attempts failed after {self.max_retries} retries: {str(last_error)}")
-        raise last_error
-
-    def initialize(self):
-        """Initialize database tables and max_sim function."""
+                if attempt >= self.max_retries:
+                    logger.error(
+                        f"All connection attempts failed after {self.max_retries} retries: {str(e)}"
+                    )
+                    raise
+                logger.warning(
+                    f"Connection attempt {attempt} failed: {str(e)}. "
+                    f"Retrying in {self.retry_delay} seconds..."
+                )
+                await asyncio.sleep(self.retry_delay)
+
         try:
-            # Use the connection with retry logic
-            with self.get_connection() as conn:
-                # Register vector extension
-                conn.execute("CREATE EXTENSION IF NOT EXISTS vector")
-                register_vector(conn)
-
-            # First check if the table exists and if it has the required columns
-            with self.get_connection() as conn:
-                check_table = conn.execute(
-                    """
-                    SELECT EXISTS (
-                        SELECT FROM information_schema.tables 
-                        WHERE table_name = 'multi_vector_embeddings'
-                    );
-                """
-                ).fetchone()[0]
+            yield conn
+        finally:
+            # Hand the connection back to the pool instead of closing it
+            await self.pool.putconn(conn)
 
-                if check_table:
-                    # Check if document_id column exists
-                    has_document_id = conn.execute(
+    async def initialize(self):
+        """Initialize database tables and max_sim function.
+
+        All DDL runs on one pooled connection inside a single transaction, so a
+        failed migration leaves the schema untouched. Optional steps run in
+        savepoints and only log when they fail.
+        """
+        try:
+            async with self.get_connection() as conn:
+                async with conn.transaction():
+                    # First check if the table exists and if it has the required columns
+                    cur = await conn.execute(
                         """
                         SELECT EXISTS (
-                            SELECT FROM information_schema.columns 
-                            WHERE table_name = 'multi_vector_embeddings' AND column_name = 'document_id'
+                            SELECT FROM information_schema.tables
+                            WHERE table_name = 'multi_vector_embeddings'
                         );
                     """
-                    ).fetchone()[0]
+                    )
+                    check_table = (await cur.fetchone())[0]
 
-                    # If the table exists but doesn't have document_id, we need to add the required columns
-                    if not has_document_id:
-                        logger.info("Updating multi_vector_embeddings table with required columns")
-                        conn.execute(
+                    if check_table:
+                        # Check if document_id column exists
+                        cur = await conn.execute(
                             """
-                            ALTER TABLE multi_vector_embeddings 
-                            ADD COLUMN document_id TEXT,
-                            ADD COLUMN chunk_number INTEGER,
-                            ADD COLUMN content TEXT,
-                            ADD COLUMN chunk_metadata TEXT
+                            SELECT EXISTS (
+                                SELECT FROM information_schema.columns
+                                WHERE table_name = 'multi_vector_embeddings'
+                                AND column_name = 'document_id'
+                            );
                         """
                         )
-                        conn.execute(
+                        has_document_id = (await cur.fetchone())[0]
+
+                        # If the table exists but doesn't have document_id, add the required columns
+                        if not has_document_id:
+                            logger.info(
+                                "Updating multi_vector_embeddings table with required columns"
+                            )
+                            await conn.execute(
+                                """
+                                ALTER TABLE multi_vector_embeddings
+                                ADD COLUMN document_id TEXT,
+                                ADD COLUMN chunk_number INTEGER,
+                                ADD COLUMN content TEXT,
+                                ADD COLUMN chunk_metadata JSONB
+                            """
+                            )
+                            await conn.execute(
+                                """
+                                ALTER TABLE multi_vector_embeddings
+                                ALTER COLUMN document_id SET NOT NULL
+                            """
+                            )
+
+                        # Convert BIT(128)[] embeddings from older versions to the packed layout
+                        cur = await conn.execute(
                             """
-                            ALTER TABLE multi_vector_embeddings 
-                            ALTER COLUMN document_id SET NOT NULL
+                            SELECT udt_name FROM information_schema.columns
+                            WHERE table_name = 'multi_vector_embeddings'
+                            AND column_name = 'embeddings'
                         """
                         )
+                        embeddings_type = await cur.fetchone()
+                        if embeddings_type and embeddings_type[0] == "_bit":
+                            await self._migrate_bit_array_embeddings(conn)
 
-                        # Add a commit to ensure changes are applied
-                        conn.commit()
-                else:
-                    # Create table if it doesn't exist with all required columns
-                    conn.execute(
+                        # Convert repr()-encoded TEXT metadata from older versions to JSONB
+                        cur = await conn.execute(
+                            """
+                            SELECT data_type FROM information_schema.columns
+                            WHERE table_name = 'multi_vector_embeddings'
+                            AND column_name = 'chunk_metadata'
                         """
-                        CREATE TABLE IF NOT EXISTS multi_vector_embeddings (
-                            id BIGSERIAL PRIMARY KEY,
-                            document_id TEXT NOT NULL,
-                            chunk_number INTEGER NOT NULL,
-                            content TEXT NOT NULL,
-                            chunk_metadata TEXT,
-                            embeddings BIT(128)[]
                         )
-                    """
-                    )
+                        metadata_type = await cur.fetchone()
+                        if metadata_type and metadata_type[0] == "text":
+                            await self._migrate_text_metadata(conn)
 
-                # Add a commit to ensure table creation is complete
-                conn.commit()
-
-            try:
-                # Create index on document_id
-                with self.get_connection() as conn:
-                    conn.execute(
+                        # Only alter the table when the column is missing; ALTER TABLE takes an
+                        # ACCESS EXCLUSIVE lock even when IF NOT EXISTS makes it a no-op
+                        cur = await conn.execute(
+                            """
+                            SELECT EXISTS (
+                                SELECT FROM information_schema.columns
+                                WHERE table_name = 'multi_vector_embeddings'
+                                AND column_name = 'token_summary'
+                            )
                         """
-                        CREATE INDEX IF NOT EXISTS idx_multi_vector_document_id 
-                        ON multi_vector_embeddings (document_id)
-                    """
-                    )
-            except Exception as e:
-                # Log index creation failure but continue
-                logger.warning(f"Failed to create index: {str(e)}")
-
-            try:
-                # First, try to drop the existing function if it exists
-                with self.get_connection() as conn:
-                    conn.execute(
+                        )
+                        if not (await cur.fetchone())[0]:
+                            await conn.execute(
+                                "ALTER TABLE multi_vector_embeddings ADD COLUMN token_summary BYTEA"
+                            )
+                    else:
+                        # Create table if it doesn't exist with all required columns
+                        await conn.execute(
+                            """
+                            CREATE TABLE IF NOT EXISTS multi_vector_embeddings (
+                                id BIGSERIAL PRIMARY KEY,
+                                document_id TEXT NOT NULL,
+                                chunk_number INTEGER NOT NULL,
+                                content TEXT NOT NULL,
+                                chunk_metadata JSONB,
+                                embeddings BYTEA NOT NULL,
+                                num_tokens INTEGER NOT NULL,
+                                token_summary BYTEA
+                            )
                         """
-                        DROP FUNCTION IF EXISTS max_sim(bit[], bit[])
-                    """
-                    )
-                    logger.info("Dropped existing max_sim function")
+                        )
 
-                    # Create max_sim function
-                    conn.execute(
-                        """
-                        CREATE OR REPLACE FUNCTION max_sim(document bit[], query bit[]) RETURNS double precision AS $$
-                            WITH queries AS (
-                                SELECT row_number() OVER () AS query_number, * FROM (SELECT unnest(query) AS query) AS foo
-                            ),
-                            documents AS (
-                                SELECT unnest(document) AS document
-                            ),
-                            similarities AS (
-                                SELECT 
-                                    query_number, 
-                                    1.0 - (bit_count(document # query)::float / greatest(bit_length(query), 1)::float) AS similarity
-                                FROM queries CROSS JOIN documents
-                            ),
-                            max_similarities AS (
-                                SELECT MAX(similarity) AS max_similarity FROM similarities GROUP BY query_number
+                    try:
+                        # Composite index serves both document_id filters (as its prefix) and
+                        # (document_id, chunk_number) lookups from get_chunks_by_id
+                        async with conn.transaction():
+                            await conn.execute(
+                                """
+                                CREATE INDEX IF NOT EXISTS idx_mv_doc_chunk
+                                ON multi_vector_embeddings (document_id, chunk_number)
+                            """
                             )
-                            SELECT SUM(max_similarity) FROM max_similarities
-                        $$ LANGUAGE SQL
-                    """
-                    )
-                    logger.info("Created max_sim function successfully")
-            except Exception as e:
-                logger.error(f"Error creating max_sim function: {str(e)}")
-                # Continue even if function creation fails - it might already exist and be usable
+                            await conn.execute("DROP INDEX IF EXISTS idx_multi_vector_document_id")
+                    except psycopg.Error as e:
+                        # Log index creation failure but continue
+                        logger.warning(f"Failed to create index: {str(e)}")
+
+                    try:
+                        async with conn.transaction():
+                            # First, try to drop the existing function if it exists
+                            await conn.execute(
+                                """
+                                DROP FUNCTION IF EXISTS max_sim(bit[], bit[])
+                            """
+                            )
+                            await conn.execute(
+                                """
+                                DROP FUNCTION IF EXISTS max_sim(bytea, bytea, integer)
+                            """
+                            )
+                            logger.info("Dropped existing max_sim function")
+
+                            # Create max_sim function over packed token buffers
+                            await conn.execute(MAX_SIM_SQL)
+                        logger.info("Created max_sim function successfully")
+                    except psycopg.Error as e:
+                        logger.error(f"Error creating max_sim function: {str(e)}")
+                        # Continue even if function creation fails - it might already exist
+
+                    try:
+                        # Prefer the xor/popcount C kernel from pg_extensions/morphik_max_sim
+                        async with conn.transaction():
+                            await conn.execute("CREATE EXTENSION IF NOT EXISTS morphik_max_sim")
+                            await conn.execute("ALTER EXTENSION morphik_max_sim UPDATE")
+                            # Versions before 1.2 lack the overload that checks document_tokens
+                            cur = await conn.execute(
+                                "SELECT to_regprocedure("
+                                "'max_sim_bin(bytea, bytea, integer, integer)') IS NOT NULL"
+                            )
+                            if not (await cur.fetchone())[0]:
+                                raise psycopg.errors.UndefinedFunction(
+                                    "morphik_max_sim is older than 1.2 and cannot be updated"
+                                )
+                        self.max_sim_function = "max_sim_bin"
+                        logger.info("Using max_sim_bin from the morphik_max_sim extension")
+                    except psycopg.Error as e:
+                        self.max_sim_function = "max_sim"
+                        logger.info(
+                            "morphik_max_sim extension not available, falling back to SQL "
+                            f"max_sim: {str(e)}"
+                        )
+
+            if self.prefilter_factor > 0:
+                try:
+                    await self._backfill_token_summaries()
+                except psycopg.Error as e:
+                    # Rows without a summary are always fully scored, so this only costs speed
+                    logger.warning(f"Failed to backfill token summaries: {str(e)}")
 
             logger.info("MultiVectorStore initialized successfully")
             return True
@@ -205,25 +372,182 @@ class MultiVectorStore(BaseVectorStore):
             logger.error(f"Error initializing MultiVectorStore: {str(e)}")
             return False
 
-    def _binary_quantize(self, embeddings: Union[np.ndarray, torch.Tensor, List]) -> List[Bit]:
-        """Convert embeddings to binary format for PostgreSQL BIT[] arrays."""
+    async def _migrate_bit_array_embeddings(self, conn: psycopg.AsyncConnection) -> None:
+        """Rewrite BIT(n)[] embeddings into the packed bytea layout in place."""
+        logger.info("Migrating multi_vector_embeddings from BIT[] to packed BYTEA embeddings")
+        async with conn.transaction():
+            await conn.execute(
+                """
+                CREATE FUNCTION pg_temp.bit_tokens_to_bytea(tokens bit[]) RETURNS bytea AS $$
+                    SELECT decode(
+                        string_agg(
+                            lpad(
+                                to_hex(
+                                    substring(token FROM byte_number * 8 + 1 FOR 8)::bit(8)::int
+                                ),
+                                2,
+                                '0'
+                            ),
+                            '' ORDER BY token_number, byte_number
+                        ),
+                        'hex'
+                    )
+                    FROM unnest(tokens) WITH ORDINALITY AS t(token, token_number),
+                         generate_series(0, (length(token) + 7) / 8 - 1) AS byte_number
+                $$ LANGUAGE SQL IMMUTABLE
+                """
+            )
+            await conn.execute(
+                "ALTER TABLE multi_vector_embeddings ADD COLUMN IF NOT EXISTS num_tokens INTEGER"
+            )
+            await conn.execute(
+                "UPDATE multi_vector_embeddings "
+                "SET num_tokens = coalesce(cardinality(embeddings), 0)"
+            )
+            await conn.execute(
+                """
+                ALTER TABLE multi_vector_embeddings
+                ALTER COLUMN embeddings TYPE BYTEA USING pg_temp.bit_tokens_to_bytea(embeddings)
+                """
+            )
+        logger.info("Migrated multi_vector_embeddings to packed BYTEA embeddings")
+
+    async def _migrate_text_metadata(self, conn: psycopg.AsyncConnection) -> None:
+        """Rewrite chunk_metadata from Python repr() text into a JSONB column.
+
+        The old text values were written with str(dict), so they are parsed with
+        ast.literal_eval rather than in SQL; values that cannot be parsed become {}.
+        """
+        logger.info("Migrating multi_vector_embeddings.chunk_metadata from TEXT to JSONB")
+        async with conn.transaction():
+            await conn.execute(
+                "ALTER TABLE multi_vector_embeddings ADD COLUMN chunk_metadata_jsonb JSONB"
+            )
+            cur = await conn.execute(
+                "SELECT id, chunk_metadata FROM multi_vector_embeddings "
+                "WHERE chunk_metadata IS NOT NULL"
+            )
+            rows = await cur.fetchall()
+
+            updates = []
+            for row_id, text in rows:
+                try:
+                    metadata = ast.literal_eval(text) if text else {}
+                except (ValueError, SyntaxError):
+                    metadata = {}
+                if not isinstance(metadata, dict):
+                    metadata = {}
+                updates.append((Jsonb(metadata), row_id))
+
+            async with conn.cursor() as cur:
+                query = "UPDATE multi_vector_embeddings SET chunk_metadata_jsonb = %s WHERE id = %s"
+                for start in range(0, len(updates), self.batch_size):
+                    await cur.executemany(query, updates[start : start + self.batch_size])
+
+            await conn.execute("ALTER TABLE multi_vector_embeddings DROP COLUMN chunk_metadata")
+            await conn.execute(
+                "ALTER TABLE multi_vector_embeddings "
+                "RENAME COLUMN chunk_metadata_jsonb TO chunk_metadata"
+            )
+        logger.info(f"Migrated metadata of {len(updates)} multi-vector chunks to JSONB")
+
+    async def _backfill_token_summaries(self) -> None:
+        """Compute token_summary for rows stored without one.
+
+        Runs after the initialize() transaction, one batch per transaction, so no lock
+        is held for the whole backfill. SKIP LOCKED lets the API and the workers, which
+        all initialize at startup, split the rows instead of racing on them.
+        """
+        total = 0
+        async with self.get_connection() as conn:
+            while True:
+                async with conn.transaction():
+                    cur = await conn.execute(
+                        """
+                        SELECT id, embeddings, num_tokens FROM multi_vector_embeddings
+                        WHERE token_summary IS NULL AND num_tokens > 0
+                        LIMIT %s
+                        FOR UPDATE SKIP LOCKED
+                        """,
+                        (self.batch_size,),
+                    )
+                    rows = await cur.fetchall()
+                    if not rows:
+                        break
+
+                    updates = []
+                    for row_id, embeddings, num_tokens in rows:
+                        packed = np.frombuffer(embeddings, dtype=np.uint8).reshape(num_tokens, -1)
+                        updates.append((self._summarize_tokens(packed).tobytes(), row_id))
+
+                    async with conn.cursor() as cur:
+                        await cur.executemany(
+                            "UPDATE multi_vector_embeddings SET token_summary = %s WHERE id = %s",
+                            updates,
+                        )
+                total += len(updates)
+
+        if total:
+            logger.info(f"Backfilled token summaries for {total} multi-vector chunks")
+
+    @staticmethod
+    def _summarize_tokens(packed: np.ndarray) -> np.ndarray:
+        """Collapse packed tokens into one packed token holding the per-bit majority.
+
+        max_sim against this single token is a cheap, approximate stand-in for
+        max_sim against every token of the chunk, used to pick rerank candidates.
+        """
+        bits = np.unpackbits(packed, axis=-1)
+        return np.packbits(bits.sum(axis=0) * 2 >= packed.shape[0])
+
+    def _binary_quantize(self, embeddings: Union[np.ndarray, torch.Tensor, List]) -> np.ndarray:
+        """Binary-quantize embeddings into packed bits, one row of bytes per token.
+
+        Returns a uint8 array of shape (num_tokens, ceil(dim / 8)); ``tobytes()`` on it
+        gives the contiguous layout stored in the ``embeddings`` BYTEA column.
+        """
+        if isinstance(embeddings, list):
+            if not embeddings:
+                return np.empty((0, 0), dtype=np.uint8)
+            if isinstance(embeddings[0], torch.Tensor):
+                embeddings = torch.stack(embeddings)
         if isinstance(embeddings, torch.Tensor):
-            embeddings = embeddings.cpu().numpy()
-        if isinstance(embeddings, list) and not isinstance(embeddings[0], np.ndarray):
-            embeddings = np.array(embeddings)
-        
-        # Add this check to ensure pgvector is registered for the connection
-        with self.get_connection() as conn:
-            register_vector(conn)
-        
-        return [Bit(embedding > 0) for embedding in embeddings]
+            return self._binary_quantize_tensor(embeddings)
+
+        array = np.atleast_2d(np.asarray(embeddings))
+        # packbits sets a bit for every nonzero element, which for bool and unsigned
+        # input (already-binarized embeddings) is the same as the > 0 threshold
+        if array.dtype == np.bool_ or np.issubdtype(array.dtype, np.unsignedinteger):
+            return np.packbits(array, axis=-1)
+
+        return np.packbits(array > 0, axis=-1)
+
+    @staticmethod
+    def _binary_quantize_tensor(embeddings: torch.Tensor) -> np.ndarray:
+        """Threshold and pack a tensor on its own device, copying only the packed bytes to host.
+
+        Produces exactly the same layout as np.packbits (MSB first, zero padded), but
+        moves 1 bit per dimension off the GPU instead of a float per dimension.
+        """
+        bits = (torch.atleast_2d(embeddings) > 0).to(torch.uint8)
+        pad = -bits.shape[-1] % 8
+        if pad:
+            bits = torch.nn.functional.pad(bits, (0, pad))
+        bits = bits.reshape(*bits.shape[:-1], -1, 8)
+        weights = torch.tensor([128, 64, 32, 16, 8, 4, 2, 1], dtype=torch.uint8, device=bits.device)
+        packed = (bits * weights).sum(dim=-1, dtype=torch.uint8)
+        return packed.cpu().numpy()
 
     async def store_embeddings(self, chunks: List[DocumentChunk]) -> Tuple[bool, List[str]]:
-        """Store document chunks with their multi-vector embeddings."""
-        # try:
+        """Store document chunks with their multi-vector embeddings.
+
+        All rows are streamed to PostgreSQL through a single binary ``COPY`` on one
+        connection instead of issuing one ``INSERT`` (and one connection) per chunk.
+        """
         if not chunks:
             return True, []
 
+        rows = []
         stored_ids = []
 
         for chunk in chunks:
@@ -235,37 +559,68 @@ class MultiVectorStore(BaseVectorStore):
                 continue
 
             # For multi-vector embeddings, we expect a list of vectors
-            embeddings = chunk.embedding
-
-            # Create binary representation for each vector
-            binary_embeddings = self._binary_quantize(embeddings)
+            packed = self._binary_quantize(chunk.embedding)
+            if packed.size == 0:
+                logger.error(f"Empty embeddings for chunk {chunk.document_id}-{chunk.chunk_number}")
+                continue
 
-            # Insert into database with retry logic
-            with self.get_connection() as conn:
-                conn.execute(
-                    """
-                    INSERT INTO multi_vector_embeddings 
-                    (document_id, chunk_number, content, chunk_metadata, embeddings) 
-                    VALUES (%s, %s, %s, %s, %s)
-                    """,
-                    (
-                        chunk.document_id,
-                        chunk.chunk_number,
-                        chunk.content,
-                        str(chunk.metadata),
-                        binary_embeddings,
-                    ),
+            rows.append(
+                (
+                    chunk.document_id,
+                    chunk.chunk_number,
+                    chunk.content,
+                    Jsonb(chunk.metadata),
+                    packed.tobytes(),
+                    packed.shape[0],
+                    # Only the prefilter reads summaries; initialize() backfills them if it
+                    # is enabled later
+                    self._summarize_tokens(packed).tobytes() if self.prefilter_factor > 0 else None,
                 )
-
+            )
             stored_ids.append(f"{chunk.document_id}-{chunk.chunk_number}")
 
-        logger.debug(f"{len(stored_ids)} vector embeddings added successfully!")
-        return len(stored_ids) > 0, stored_ids
+        if not rows:
+            return False, []
 
-        # except Exception as e:
-        #     logger.error(f"Error storing multi-vector embeddings: {str(e)}")
-        #     raise e
-        #     return False, []
+        async with self.get_connection() as conn:
+            try:
+                await self._copy_rows(conn, rows)
+            except psycopg.Error as e:
+                logger.warning(
+                    "Binary COPY of multi-vector embeddings failed, falling back to batched "
+                    f"INSERT: {str(e)}"
+                )
+                await self._insert_rows(conn, rows)
+
+        await self._invalidate_query_cache()
+        logger.debug(f"{len(stored_ids)} vector embeddings added successfully!")
+        return True, stored_ids
+
+    async def _copy_rows(self, conn: psycopg.AsyncConnection, rows: List[tuple]) -> None:
+        """Stream rows into multi_vector_embeddings with a single binary COPY."""
+        async with conn.cursor() as cur:
+            async with cur.copy(
+                f"COPY multi_vector_embeddings ({MULTI_VECTOR_COLUMNS}) "
+                "FROM STDIN WITH (FORMAT BINARY)"
+            ) as copy:
+                copy.set_types(["text", "int4", "text", "jsonb", "bytea", "int4", "bytea"])
+                for row in rows:
+                    await copy.write_row(row)
+
+    async def _insert_rows(self, conn: psycopg.AsyncConnection, rows: List[tuple]) -> None:
+        """Insert rows with batched executemany calls inside one transaction.
+
+        executemany prepares the statement once and pipelines the batch, so this
+        avoids a round-trip and a commit per row even without COPY.
+        """
+        query = (
+            f"INSERT INTO multi_vector_embeddings ({MULTI_VECTOR_COLUMNS}) "
+            "VALUES (%s, %s, %s, %s, %s, %s, %s)"
+        )
+        async with conn.transaction():
+            async with conn.cursor() as cur:
+                for start in range(0, len(rows), self.batch_size):
+                    await cur.executemany(query, rows[start : start + self.batch_size])
 
     async def query_similar(
         self,
@@ -274,59 +629,133 @@ class MultiVectorStore(BaseVectorStore):
         doc_ids: Optional[List[str]] = None,
     ) -> List[DocumentChunk]:
         """Find similar chunks using the max_sim function for multi-vectors."""
-        # try:
         # Convert query embeddings to binary format
-        binary_query_embeddings = self._binary_quantize(query_embedding)
+        packed_query = self._binary_quantize(query_embedding)
 
-        # Build query
-        query = """
-            SELECT id, document_id, chunk_number, content, chunk_metadata, 
-                    max_sim(embeddings, %s) AS similarity
-            FROM multi_vector_embeddings
-        """
+        cache_key = await self._query_cache_key(packed_query, k, doc_ids)
+        cached = await self._get_cached_chunks(cache_key)
+        if cached is not None:
+            return cached
 
-        params = [binary_query_embeddings]
+        query_bytes = packed_query.tobytes()
+        token_bytes = packed_query.shape[1]
 
-        # Add document filter if needed with proper parameterization
+        # Add document filter if needed; a single array parameter keeps the statement
+        # text identical across calls so the prepared plan can be reused. Rows without
+        # tokens have no max_sim score (NULL) and are never returned.
+        where = " WHERE num_tokens > 0"
         if doc_ids:
-            # Use placeholders for each document ID
-            placeholders = ', '.join(['%s'] * len(doc_ids))
-            query += f" WHERE document_id IN ({placeholders})"
-            # Add document IDs to params
-            params.extend(doc_ids)
-
-        # Add ordering and limit
-        query += " ORDER BY similarity DESC LIMIT %s"
-        params.append(k)
+            where += " AND document_id = ANY(%s)"
+        filter_params = [list(doc_ids)] if doc_ids else []
+
+        if self.prefilter_factor > 0:
+            # Two-stage retrieval: rank chunks by max_sim against their one-token summary,
+            # then run the full max_sim only on the best k * prefilter_factor of them.
+            # Rows without a summary sort first so they are always fully scored.
+            query = f"""
+                WITH candidates AS (
+                    SELECT id FROM multi_vector_embeddings{where}
+                    ORDER BY {self.max_sim_function}(token_summary, %s, %s, 1) DESC NULLS FIRST
+                    LIMIT %s
+                )
+                SELECT m.id, m.document_id, m.chunk_number, m.content, m.chunk_metadata,
+                        {self.max_sim_function}(m.embeddings, %s, %s, m.num_tokens) AS similarity
+                FROM multi_vector_embeddings m
+                JOIN candidates USING (id)
+                ORDER BY similarity DESC LIMIT %s
+            """
+            params = [
+                *filter_params,
+                query_bytes,
+                token_bytes,
+                k * self.prefilter_factor,
+                query_bytes,
+                token_bytes,
+                k,
+            ]
+        else:
+            query = f"""
+                SELECT id, document_id, chunk_number, content, chunk_metadata,
+                        {self.max_sim_function}(embeddings, %s, %s, num_tokens) AS similarity
+                FROM multi_vector_embeddings{where}
+                ORDER BY similarity DESC LIMIT %s
+            """
+            params = [query_bytes, token_bytes, *filter_params, k]
 
         # Execute query with retry logic
-        with self.get_connection() as conn:
-            result = conn.execute(query, params).fetchall()
+        async with self.get_connection() as conn:
+            cur = await conn.execute(query, params, prepare=True)
+            result = await cur.fetchall()
 
         # Convert to DocumentChunks
         chunks = []
         for row in result:
-            try:
-                metadata = eval(row[4]) if row[4] else {}
-            except (ValueError, SyntaxError):
-                metadata = {}
-
             chunk = DocumentChunk(
                 document_id=row[1],
                 chunk_number=row[2],
                 content=row[3],
                 embedding=[],  # Don't send embeddings back
-                metadata=metadata,
+                metadata=row[4] or {},
                 score=float(row[5]),  # Use the similarity score from max_sim
             )
             chunks.append(chunk)
 
+        await self._set_cached_chunks(cache_key, chunks)
         return chunks
 
-        # except Exception as e:
-        #     logger.error(f"Error querying similar chunks: {str(e)}")
-        #     raise e
-        #     return []
+    async def _query_cache_key(
+        self, packed_query: np.ndarray, k: int, doc_ids: Optional[List[str]]
+    ) -> Optional[str]:
+        """Build the Redis key for a query, or None when caching is disabled or unavailable."""
+        if self.cache is None:
+            return None
+        try:
+            generation = await self.cache.get(QUERY_CACHE_GENERATION_KEY)
+        except RedisError as e:
+            logger.warning(f"Query cache unavailable, skipping lookup: {str(e)}")
+            return None
+
+        digest = hashlib.sha256()
+        digest.update(struct.pack("<II", packed_query.shape[1], k))
+        digest.update(packed_query.tobytes())
+        if doc_ids:
+            digest.update("\x00".join(sorted(doc_ids)).encode())
+        return f"{QUERY_CACHE_PREFIX}:{int(generation or 0)}:{digest.hexdigest()}"
+
+    async def _get_cached_chunks(self, cache_key: Optional[str]) -> Optional[List[DocumentChunk]]:
+        """Return cached query_similar results for a key, if present."""
+        if cache_key is None:
+            return None
+        try:
+            cached = await self.cache.get(cache_key)
+        except RedisError as e:
+            logger.warning(f"Query cache lookup failed: {str(e)}")
+            return None
+        if cached is None:
+            return None
+        logger.debug("Serving multi-vector query from cache")
+        return [DocumentChunk(**chunk) for chunk in json.loads(cached)]
+
+    async def _set_cached_chunks(
+        self, cache_key: Optional[str], chunks: List[DocumentChunk]
+    ) -> None:
+        """Store query_similar results under a key with the configured TTL."""
+        if cache_key is None:
+            return
+        try:
+            payload = json.dumps([chunk.model_dump(mode="json") for chunk in chunks])
+            await self.cache.setex(cache_key, self.cache_ttl, payload)
+        except (RedisError, TypeError, ValueError) as e:
+            logger.warning(f"Failed to cache multi-vector query results: {str(e)}")
+
+    async def _invalidate_query_cache(self) -> None:
+        """Retire every cached query result after the stored chunks change."""
+        if self.cache is None:
+            return
+        try:
+            await self.cache.incr(QUERY_CACHE_GENERATION_KEY)
+        except RedisError as e:
+            logger.warning(f"Failed to invalidate multi-vector query cache: {str(e)}")
 
     async def get_chunks_by_id(
         self,
@@ -334,85 +763,87 @@ class MultiVectorStore(BaseVectorStore):
     ) -> List[DocumentChunk]:
         """
         Retrieve specific chunks by document ID and chunk number in a single database query.
-        
+
         Args:
             chunk_identifiers: List of (document_id, chunk_number) tuples
-            
+
         Returns:
-            List of DocumentChunk objects
+            List of DocumentChunk objects, in the order of their first identifier.
+            Unknown identifiers are skipped.
         """
-        # try:
         if not chunk_identifiers:
             return []
-            
-        # Construct the WHERE clause with OR conditions
-        conditions = []
-        for doc_id, chunk_num in chunk_identifiers:
-            conditions.append(f"(document_id = '{doc_id}' AND chunk_number = {chunk_num})")
-        
-        where_clause = " OR ".join(conditions)
-        
-        # Build and execute query
-        query = f"""
-            SELECT document_id, chunk_number, content, chunk_metadata
-            FROM multi_vector_embeddings
-            WHERE {where_clause}
+
+        # Pass the identifiers as two parallel arrays so the statement text never changes.
+        # Duplicates are dropped first because the join below would repeat their rows.
+        unique_identifiers = list(dict.fromkeys(chunk_identifiers))
+        document_ids = [doc_id for doc_id, _ in unique_identifiers]
+        chunk_numbers = [chunk_num for _, chunk_num in unique_identifiers]
+
+        # Joining the unnested pairs lets the planner probe idx_mv_doc_chunk once per pair;
+        # the ordinality keeps the rows in the order they were requested
+        query = """
+            SELECT m.document_id, m.chunk_number, m.content, m.chunk_metadata
+            FROM unnest(%s::text[], %s::int[])
+                WITH ORDINALITY AS v(document_id, chunk_number, position)
+            JOIN multi_vector_embeddings m USING (document_id, chunk_number)
+            ORDER BY v.position
         """
-        
+
         logger.debug(f"Batch retrieving {len(chunk_identifiers)} chunks from multi-vector store")
-        
-        with self.get_connection() as conn:
-            result = conn.execute(query).fetchall()
-        
-        # Convert to DocumentChunks
-        chunks = []
-        for row in result:
-            try:
-                metadata = eval(row[3]) if row[3] else {}
-            except (ValueError, SyntaxError):
-                metadata = {}
-                
-            chunk = DocumentChunk(
+
+        async with self.get_connection() as conn:
+            cur = await conn.execute(query, (document_ids, chunk_numbers), prepare=True)
+            rows = await cur.fetchall()
+
+        chunks = [
+            DocumentChunk(
                 document_id=row[0],
                 chunk_number=row[1],
                 content=row[2],
                 embedding=[],  # Don't send embeddings back
-                metadata=metadata,
+                metadata=row[3] or {},
                 score=0.0,  # No relevance score for direct retrieval
             )
-            chunks.append(chunk)
-            
+            for row in rows
+        ]
+
         logger.debug(f"Found {len(chunks)} chunks in batch retrieval from multi-vector store")
         return chunks
-    
+
     async def delete_chunks_by_document_id(self, document_id: str) -> bool:
         """
         Delete all chunks associated with a document.
-        
+
         Args:
             document_id: ID of the document whose chunks should be deleted
-            
+
         Returns:
             bool: True if the operation was successful, False otherwise
         """
         try:
             # Delete all chunks for the specified document with retry logic
-            query = f"DELETE FROM multi_vector_embeddings WHERE document_id = '{document_id}'"
-            with self.get_connection() as conn:
-                conn.execute(query)
-            
+            async with self.get_connection() as conn:
+                await conn.execute(
+                    "DELETE FROM multi_vector_embeddings WHERE document_id = %s",
+                    (document_id,),
+                    prepare=True,
+                )
+            await self._invalidate_query_cache()
+
             logger.info(f"Deleted all chunks for document {document_id} from multi-vector store")
             return True
-                
+
         except Exception as e:
-            logger.error(f"Error deleting chunks for document {document_id} from multi-vector store: {str(e)}")
+            logger.error(
+                f"Error deleting chunks for document {document_id} from multi-vector store: "
+                f"{str(e)}"
+            )
             return False
-    
-    def close(self):
-        """Close the database connection."""
-        if self.conn:
-            try:
-                self.conn.close()
-                self.conn = None
-            except Exception as e:
-                logger.error(f"Error closing connection: {str(e)}")
+
+    async def close(self):
+        """Close all pooled database connections."""
+        try:
+            await self.pool.close()
+        except Exception as e:
+            logger.error(f"Error closing connection pool: {str(e)}")
@@ -1,12 +1,21 @@
-from typing import List, Optional, Tuple, AsyncContextManager, Any
+from typing import Dict, List, Optional, Tuple, AsyncContextManager, Any
+import ast
 import logging
+import math
+import re
+import struct
 import time
 import asyncio
+from collections import OrderedDict
 from contextlib import asynccontextmanager
+import asyncpg
+import numpy as np
+import orjson
+import xxhash
 from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
 from sqlalchemy.orm import sessionmaker, declarative_base
-from sqlalchemy import Column, String, Integer, Index, select, text
-from sqlalchemy.sql.expression import func
+from sqlalchemy import Column, String, Integer, Index, text
+from sqlalchemy.dialects.postgresql import JSONB
 from sqlalchemy.types import UserDefinedType
 from sqlalchemy.exc import OperationalError
 
@@ -16,6 +25,164 @@ from core.models.chunk import DocumentChunk
 logger = logging.getLogger(__name__)
 Base = declarative_base()
 PGVECTOR_MAX_DIMENSIONS = 2000  # Maximum dimensions for pgvector
+VECTOR_EMBEDDING_COLUMNS = ["document_id", "chunk_number", "content", "chunk_metadata", "embedding"]
+JSONB_BINARY_VERSION = b"\x01"  # Leading version byte of the binary jsonb wire format
+
+# Vector index parameters. HNSW needs pgvector >= 0.5.0; older versions fall back to
+# IVFFlat with lists and probes sized from the row count.
+HNSW_MIN_PGVECTOR_VERSION = (0, 5, 0)
+HNSW_M = 16
+HNSW_EF_CONSTRUCTION = 64
+HNSW_DEFAULT_EF_SEARCH = 40  # pgvector's default hnsw.ef_search
+HNSW_MAX_EF_SEARCH = 1000  # Largest hnsw.ef_search pgvector accepts
+IVFFLAT_LISTS_PATTERN = re.compile(r"lists\s*=\s*'?(\d+)")  # lists in an IVFFlat indexdef
+IVFFLAT_RETUNE_FACTOR = (
+    2  # retune() rebuilds once the ideal lists is this far from the current value
+)
+HALFVEC_MIN_PGVECTOR_VERSION = (0, 7, 0)
+POOL_MIN_SIZE = 5
+POOL_MAX_INACTIVE_CONNECTION_LIFETIME = 600  # Seconds before an idle pooled connection is closed
+POOL_STATEMENT_CACHE_SIZE = 1024
+
+# Hot-path statements. The text never varies between calls, so asyncpg prepares
+# each one once per connection and reuses it; a NULL doc_ids array means no filter.
+# <=> is cosine distance, matching the *_cosine_ops index so the planner can walk
+# the index for the top k instead of sorting. Only the distance is projected from
+# the embedding column; the vector itself is never returned.
+QUERY_SIMILAR_SQL = """
+    SELECT document_id, chunk_number, content, chunk_metadata,
+           1 - (embedding <=> $1) AS score
+    FROM vector_embeddings
+    WHERE $3::text[] IS NULL OR document_id = ANY($3::text[])
+    ORDER BY embedding <=> $1
+    LIMIT $2
+"""
+# Small batches are inserted with one unnest() statement; COPY's per-call setup
+# (column introspection and the copy sub-protocol) only pays off for larger ones
+COPY_MIN_ROWS = 64
+INSERT_EMBEDDINGS_SQL = """
+    INSERT INTO vector_embeddings (document_id, chunk_number, content, chunk_metadata, embedding)
+    SELECT * FROM unnest($1::text[], $2::int[], $3::text[], $4::jsonb[], $5::{embedding_type}[])
+"""
+# Top k per query for a batch of queries in one statement; {embedding_type} is the
+# column type discovered by initialize(), so the text is still fixed per store
+QUERY_SIMILAR_BATCH_SQL = """
+    SELECT q.qid, v.document_id, v.chunk_number, v.content, v.chunk_metadata, v.score
+    FROM unnest($1::{embedding_type}[]) WITH ORDINALITY AS q(vec, qid)
+    CROSS JOIN LATERAL (
+        SELECT document_id, chunk_number, content, chunk_metadata,
+               1 - (embedding <=> q.vec) AS score
+        FROM vector_embeddings
+        WHERE $3::text[] IS NULL OR document_id = ANY($3::text[])
+        ORDER BY embedding <=> q.vec
+        LIMIT $2
+    ) v
+    ORDER BY q.qid, v.score DESC
+"""
+GET_CHUNKS_BY_ID_SQL = """
+    SELECT ve.document_id, ve.chunk_number, ve.content, ve.chunk_metadata
+    FROM vector_embeddings ve
+    JOIN (SELECT DISTINCT * FROM unnest($1::text[], $2::int[])) AS k(document_id, chunk_number)
+    ON ve.document_id = k.document_id AND ve.chunk_number = k.chunk_number
+"""
+DELETE_BY_DOCUMENT_IDS_SQL = "DELETE FROM vector_embeddings WHERE document_id = ANY($1::text[])"
+SET_LOCAL_SQL = "SELECT set_config($1, $2, true)"
+
+
+def _dump_json(value: Any) -> bytes:
+    """Serialize chunk metadata; numpy values are written natively, other unknown types as str()."""
+    return orjson.dumps(
+        value, default=str, option=orjson.OPT_SERIALIZE_NUMPY | orjson.OPT_NON_STR_KEYS
+    )
+
+
+def _encode_jsonb(value: Any) -> bytes:
+    """Encode chunk metadata in the binary jsonb wire format."""
+    return JSONB_BINARY_VERSION + _dump_json(value)
+
+
+def _decode_jsonb(data: bytes) -> Any:
+    """Decode a binary jsonb value."""
+    return orjson.loads(data[1:])
+
+
+def _ivfflat_lists(rows: int) -> int:
+    """Number of IVFFlat lists for a table of the given size (rows / 1000, sqrt(rows) past 1M)."""
+    if rows < 1_000_000:
+        return max(30, rows // 1000)
+    return int(math.sqrt(rows))
+
+
+def _vector_codec(element_type: str) -> Tuple[Any, Any]:
+    """Binary encoder and decoder for a pgvector type with big-endian elements of element_type.
+
+    The wire format is a uint16 dimension count, a uint16 reserved field and the
+    elements, so values are packed and unpacked with one numpy conversion each
+    instead of going through per-element Python calls.
+    """
+    header = struct.Struct(">HH")
+
+    def encode(value: Any) -> bytes:
+        array = np.asarray(value, dtype=element_type)
+        return header.pack(array.shape[0], 0) + array.tobytes()
+
+    def decode(data: bytes) -> np.ndarray:
+        return np.frombuffer(data, dtype=element_type, offset=header.size).astype(np.float32)
+
+    return encode, decode
+
+
+VECTOR_CODECS = {"vector": _vector_codec(">f4"), "halfvec": _vector_codec(">f2")}
+
+
+def _vector_array(embeddings: List[Any]) -> List[memoryview]:
+    """Embeddings as the elements of a vector[] / halfvec[] parameter.
+
+    asyncpg treats any sized iterable inside an array parameter as a nested
+    dimension and would hand the vector codec one float at a time; a memoryview
+    is passed to the element codec whole.
+    """
+    return [
+        memoryview(np.ascontiguousarray(embedding, dtype=np.float32)) for embedding in embeddings
+    ]
+
+
+# Schema of each pgvector type; managed providers such as Supabase install the
+# extension into "extensions" rather than "public"
+VECTOR_TYPE_SCHEMAS_SQL = """
+SELECT t.typname, n.nspname
+FROM pg_extension e
+JOIN pg_type t ON t.typnamespace = e.extnamespace
+JOIN pg_namespace n ON n.oid = e.extnamespace
+WHERE e.extname = 'vector' AND t.typname = ANY($1::text[])
+"""
+
+
+async def _init_connection(conn: asyncpg.Connection) -> None:
+    """Register pgvector and jsonb codecs on a new asyncpg connection."""
+    rows = await conn.fetch(VECTOR_TYPE_SCHEMAS_SQL, list(VECTOR_CODECS))
+    schemas = {row["typname"]: row["nspname"] for row in rows}
+    for type_name, (encoder, decoder) in VECTOR_CODECS.items():
+        schema = schemas.get(type_name)
+        if schema is None:
+            # halfvec only exists on pgvector >= 0.7; a missing vector type means the
+            # extension is not installed and must not go unnoticed
+            if type_name != "halfvec":
+                raise ValueError(
+                    f"pgvector type {type_name!r} not found; is the vector extension installed?"
+                )
+            logger.debug("pgvector halfvec type not available, skipping codec")
+            continue
+        await conn.set_type_codec(
+            type_name, encoder=encoder, decoder=decoder, schema=schema, format="binary"
+        )
+    await conn.set_type_codec(
+        "jsonb",
+        encoder=_encode_jsonb,
+        decoder=_decode_jsonb,
+        schema="pg_catalog",
+        format="binary",
+    )
 
 
 class Vector(UserDefinedType):
@@ -26,8 +193,10 @@ class Vector(UserDefinedType):
 
     def bind_processor(self, dialect):
         def process(value):
+            if isinstance(value, np.ndarray):
+                value = value.tolist()
             if isinstance(value, list):
-                return f"[{','.join(str(x) for x in value)}]"
+                return f"[{','.join(map(str, value))}]"
             return value
 
         return process
@@ -36,9 +205,8 @@ class Vector(UserDefinedType):
         def process(value):
             if value is None:
                 return None
-            # Remove brackets and split by comma
-            value = value[1:-1].split(",")
-            return [float(x) for x in value]
+            # Only the text protocol reaches here; pooled reads use the binary codecs
+            return np.array(value.strip("[]").split(","), dtype=np.float32)
 
         return process
 
@@ -52,17 +220,18 @@ class VectorEmbedding(Base):
     document_id = Column(String, nullable=False)
     chunk_number = Column(Integer, nullable=False)
     content = Column(String, nullable=False)
-    chunk_metadata = Column(String, nullable=True)
+    chunk_metadata = Column(JSONB, nullable=True)
     embedding = Column(Vector, nullable=False)
 
     # Create indexes
     __table_args__ = (
-        Index("idx_document_id", "document_id"),
+        Index("idx_vector_doc_chunk", "document_id", "chunk_number"),
         Index(
-            "idx_vector_embedding",
+            "vector_idx",
             embedding,
-            postgresql_using="ivfflat",
-            postgresql_with={"lists": 100},
+            postgresql_using="hnsw",
+            postgresql_with={"m": HNSW_M, "ef_construction": HNSW_EF_CONSTRUCTION},
+            postgresql_ops={"embedding": "vector_cosine_ops"},
         ),
     )
 
@@ -75,30 +244,42 @@ class PGVectorStore(BaseVectorStore):
         uri: str,
         max_retries: int = 3,
         retry_delay: float = 1.0,
+        hnsw_ef_search: int = HNSW_DEFAULT_EF_SEARCH,
+        ivfflat_probes: Optional[int] = None,
+        use_halfvec: bool = True,
     ):
         """Initialize PostgreSQL connection for vector storage.
-        
+
         Args:
             uri: PostgreSQL connection URI
             max_retries: Maximum number of connection retry attempts
             retry_delay: Delay in seconds between retry attempts
+            hnsw_ef_search: HNSW candidate list size per query; raised to k when k is larger
+            ivfflat_probes: IVFFlat lists scanned per query; defaults to sqrt(lists)
+            use_halfvec: Create new tables with half-precision halfvec when pgvector supports it;
+                an existing table is only converted when [vector_store].convert_to_halfvec is set
         """
         # Load settings from config
         from core.config import get_settings
+
         settings = get_settings()
-        
+
         # Get database pool settings from config with defaults
         pool_size = getattr(settings, "DB_POOL_SIZE", 20)
         max_overflow = getattr(settings, "DB_MAX_OVERFLOW", 30)
         pool_recycle = getattr(settings, "DB_POOL_RECYCLE", 3600)
         pool_timeout = getattr(settings, "DB_POOL_TIMEOUT", 10)
         pool_pre_ping = getattr(settings, "DB_POOL_PRE_PING", True)
-        
+        query_cache_size = getattr(settings, "VECTOR_QUERY_CACHE_SIZE", 0)
+        query_cache_ttl = getattr(settings, "VECTOR_QUERY_CACHE_TTL", 0)
+
         # Use the URI exactly as provided without any modifications
         # This ensures compatibility with Supabase and other PostgreSQL providers
-        logger.info(f"Initializing vector store database engine with pool size={pool_size}, "
-                   f"max_overflow={max_overflow}, pool_recycle={pool_recycle}s")
-        
+        logger.info(
+            f"Initializing vector store database engine with pool size={pool_size}, "
+            f"max_overflow={max_overflow}, pool_recycle={pool_recycle}s"
+        )
+
         # Create the engine with the URI as is and improved connection pool settings
         self.engine = create_async_engine(
             uri,
@@ -115,226 +296,660 @@ class PGVectorStore(BaseVectorStore):
             # Echo SQL for debugging (set to False in production)
             echo=False,
         )
-        
+
         # Log success
         logger.info("Created vector store database engine successfully")
         self.async_session = sessionmaker(self.engine, class_=AsyncSession, expire_on_commit=False)
         self.max_retries = max_retries
         self.retry_delay = retry_delay
-        
+
+        # asyncpg takes a plain libpq URI; the pool is created on first use so that
+        # initialize() has created the vector extension before codecs are registered
+        self.asyncpg_uri = uri.replace("postgresql+asyncpg://", "postgresql://", 1)
+        self.pool_size = pool_size
+        self.pool_min_size = min(POOL_MIN_SIZE, pool_size)
+        self.pool: Optional[asyncpg.Pool] = None
+        self._pool_lock = asyncio.Lock()
+
+        # Set once initialize() succeeds so repeated calls skip the schema checks
+        self._initialized = False
+
+        # Vector index in use, discovered by initialize(); query_similar tunes the
+        # per-query search parameters to match
+        self.hnsw_ef_search = hnsw_ef_search
+        self.ivfflat_probes = ivfflat_probes
+        self.index_type: Optional[str] = None
+        self.ivfflat_lists: Optional[int] = None
+
+        # Column type for embeddings; set by initialize() from the existing table, or
+        # halfvec for a new one on pgvector >= 0.7
+        self.use_halfvec = use_halfvec
+        self.pgvector_version: Tuple[int, ...] = (0,)
+        self.embedding_type = "vector"
+
+        # Optional (off by default) in-process LRU of query_similar results. Writes
+        # through this instance bump the generation so in-flight queries cannot
+        # repopulate stale entries; writes made by other processes, such as the
+        # ingestion worker, are only seen once entries outlive the TTL.
+        self.query_cache: "OrderedDict[tuple, Tuple[float, List[DocumentChunk]]]" = OrderedDict()
+        self.query_cache_size = query_cache_size
+        self.query_cache_ttl = query_cache_ttl
+        self._cache_generation = 0
+
+    @classmethod
+    async def create(
+        cls,
+        uri: str,
+        min_size: int = POOL_MIN_SIZE,
+        max_size: Optional[int] = None,
+        **kwargs: Any,
+    ) -> "PGVectorStore":
+        """Create a store, initialize its schema and open a warm connection pool.
+
+        The pool's first min_size connections are opened (with codecs registered)
+        before this returns, so the first query does not pay for connection setup.
+
+        Args:
+            uri: PostgreSQL connection URI
+            min_size: Connections the pool keeps open
+            max_size: Maximum pool size; defaults to DB_POOL_SIZE
+            **kwargs: Passed through to PGVectorStore()
+
+        Raises:
+            RuntimeError: If the schema could not be initialized
+        """
+        store = cls(uri, **kwargs)
+        if max_size is not None:
+            store.pool_size = max_size
+        store.pool_min_size = min(min_size, store.pool_size)
+
+        # The pool registers pgvector codecs, so the extension must exist first
+        if not await store.initialize():
+            await store.close()
+            raise RuntimeError("PGVector store initialization failed")
+        await store.get_pool()
+        return store
+
+    async def get_pool(self) -> asyncpg.Pool:
+        """Get the asyncpg pool used for reads and writes, creating it on first use.
+
+        Every pooled connection has the pgvector and jsonb binary codecs registered,
+        so embeddings and metadata are exchanged in binary instead of text and rows
+        are decoded without going through the ORM.
+        """
+        if self.pool is None:
+            async with self._pool_lock:
+                if self.pool is None:
+                    self.pool = await asyncpg.create_pool(
+                        self.asyncpg_uri,
+                        min_size=self.pool_min_size,
+                        max_size=self.pool_size,
+                        max_inactive_connection_lifetime=POOL_MAX_INACTIVE_CONNECTION_LIFETIME,
+                        statement_cache_size=POOL_STATEMENT_CACHE_SIZE,
+                        init=_init_connection,
+                    )
+        return self.pool
+
     @asynccontextmanager
     async def get_session_with_retry(self) -> AsyncContextManager[AsyncSession]:
         """Get a SQLAlchemy async session with retry logic.
-        
+
+        The session checks out its pooled connection up front, retrying on
+        connection failures. No test query is sent; stale connections are
+        handled by the engine's pool_pre_ping on checkout.
+
         Yields:
             AsyncSession: A SQLAlchemy async session
-            
+
         Raises:
             OperationalError: If all connection attempts fail
         """
         attempt = 0
-        last_error = None
-        
-        while attempt < self.max_retries:
-            try:
-                async with self.async_session() as session:
-                    # Test if the connection is valid with a simple query
-                    await session.execute(text("SELECT 1"))
-                    yield session
-                    return
-            except OperationalError as e:
-                last_error = e
-                attempt += 1
-                if attempt < self.max_retries:
-                    logger.warning(f"Database connection attempt {attempt} failed: {str(e)}. Retrying in {self.retry_delay} seconds...")
+
+        async with self.async_session() as session:
+            while True:
+                try:
+                    await session.connection()
+                    break
+                except OperationalError as e:
+                    attempt += 1
+                    if attempt >= self.max_retries:
+                        logger.error(
+                            f"All database connection attempts failed after "
+                            f"{self.max_retries} retries: {str(e)}"
+                        )
+                        raise
+                    logger.warning(
+                        f"Database connection attempt {attempt} failed: {str(e)}. "
+                        f"Retrying in {self.retry_delay} seconds..."
+                    )
+                    await session.rollback()
                     await asyncio.sleep(self.retry_delay)
-        
-        # If we get here, all retries failed
-        logger.error(f"All database connection attempts failed after {self.max_retries} retries: {str(last_error)}")
-        raise last_error
+
+            yield session
 
     async def initialize(self):
-        """Initialize database tables and vector extension."""
+        """Initialize database tables and vector extension.
+
+        Everything runs in a single transaction, and the extension version and the
+        current embedding column are read with one catalog query. Once it has
+        succeeded, later calls on the same store return immediately.
+        """
+        if self._initialized:
+            return True
+
         try:
             # Import config to get vector dimensions
             from core.config import get_settings
+
             settings = get_settings()
             dimensions = min(settings.VECTOR_DIMENSIONS, PGVECTOR_MAX_DIMENSIONS)
-            
+
             logger.info(f"Initializing PGVector store with {dimensions} dimensions")
-            
+
             # Use retry logic for initialization
             attempt = 0
-            last_error = None
-            
-            while attempt < self.max_retries:
+
+            while True:
                 try:
                     async with self.engine.begin() as conn:
-                        # Enable pgvector extension
-                        await conn.execute(
-                            text("CREATE EXTENSION IF NOT EXISTS vector")
+                        await self._initialize_schema(
+                            conn,
+                            dimensions,
+                            settings.VECTOR_DIMENSION_CHANGE_POLICY,
+                            settings.VECTOR_CONVERT_TO_HALFVEC,
                         )
-                        logger.info("Enabled pgvector extension")
-                        
-                        # Rest of initialization code follows
-                        break  # Success, exit the retry loop
+                    break  # Success, exit the retry loop
                 except OperationalError as e:
-                    last_error = e
                     attempt += 1
                     if attempt < self.max_retries:
-                        logger.warning(f"Database initialization attempt {attempt} failed: {str(e)}. Retrying in {self.retry_delay} seconds...")
+                        logger.warning(
+                            f"Database initialization attempt {attempt} failed: {str(e)}. "
+                            f"Retrying in {self.retry_delay} seconds..."
+                        )
                         await asyncio.sleep(self.retry_delay)
                     else:
-                        logger.error(f"All database initialization attempts failed after {self.max_retries} retries: {str(last_error)}")
-                        raise last_error
-            
-            # Continue with the rest of the initialization
-            async with self.engine.begin() as conn:
-                
-                # Check if vector_embeddings table exists
-                check_table_sql = """
-                SELECT EXISTS (
-                    SELECT FROM information_schema.tables 
-                    WHERE table_name = 'vector_embeddings'
-                );
+                        logger.error(
+                            f"All database initialization attempts failed after "
+                            f"{self.max_retries} retries: {str(e)}"
+                        )
+                        raise
+
+            self._initialized = True
+            logger.info("PGVector store initialized successfully")
+            return True
+        except Exception as e:
+            logger.error(f"Error initializing PGVector store: {str(e)}")
+            return False
+
+    async def _initialize_schema(
+        self, conn, dimensions: int, dimension_change_policy: str, convert_to_halfvec: bool = False
+    ) -> None:
+        """Create or migrate the vector extension, table and indexes inside one transaction.
+
+        When the configured dimensions differ from the existing table, the table is
+        dropped and recreated if dimension_change_policy is "recreate"; otherwise
+        initialization is aborted with a ValueError.
+
+        An existing vector column keeps its type unless convert_to_halfvec is set: the
+        conversion is lossy and rewrites the whole table under an exclusive lock.
+        """
+        # Enable pgvector extension
+        await conn.execute(text("CREATE EXTENSION IF NOT EXISTS vector"))
+
+        # Extension version plus the type and dimensions of the existing embedding
+        # column, if the table exists (pgvector stores the dimensions as the typmod)
+        result = await conn.execute(
+            text(
                 """
-                result = await conn.execute(text(check_table_sql))
-                table_exists = result.scalar()
-                
-                if table_exists:
-                    # Check current vector dimensions
-                    check_dim_sql = """
-                    SELECT atttypmod - 4 AS dimensions
+                SELECT e.extversion, col.dimensions, col.typname
+                FROM pg_extension e
+                LEFT JOIN (
+                    SELECT a.atttypmod AS dimensions, t.typname
                     FROM pg_attribute a
                     JOIN pg_class c ON a.attrelid = c.oid
                     JOIN pg_type t ON a.atttypid = t.oid
                     WHERE c.relname = 'vector_embeddings'
                     AND a.attname = 'embedding'
-                    AND t.typname = 'vector';
-                    """
-                    result = await conn.execute(text(check_dim_sql))
-                    current_dim = result.scalar()
-                    
-                    if (current_dim + 4) != dimensions:
-                        logger.warning(f"Vector dimensions changed from {current_dim} to {dimensions}. This requires recreating tables and will delete all existing vector data.")
-                        
-                        # Ask for explicit user confirmation
-                        user_input = input(f"WARNING: Embedding dimensions changed from {current_dim} to {dimensions}. This will DELETE ALL existing vector data. Type 'yes' to continue: ")
-                        
-                        if user_input.lower() != "yes":
-                            logger.info("User aborted table recreation due to dimension change")
-                            raise ValueError("Operation aborted by user. Vector dimension change requires recreating tables.")
-                        
-                        logger.info("User confirmed table recreation")
-                        
-                        # Drop existing vector index if it exists
-                        await conn.execute(text("DROP INDEX IF EXISTS vector_idx;"))
-                        
-                        # Drop existing vector embeddings table
-                        await conn.execute(text("DROP TABLE IF EXISTS vector_embeddings;"))
-                        
-                        # Create vector embeddings table with proper vector column
-                        create_table_sql = f"""
-                        CREATE TABLE vector_embeddings (
-                            id SERIAL PRIMARY KEY,
-                            document_id VARCHAR(255) NOT NULL,
-                            chunk_number INTEGER NOT NULL,
-                            content TEXT NOT NULL,
-                            chunk_metadata TEXT,
-                            embedding vector({dimensions}) NOT NULL,
-                            created_at TIMESTAMP WITH TIME ZONE DEFAULT CURRENT_TIMESTAMP
-                        );
-                        """
-                        await conn.execute(text(create_table_sql))
-                        logger.info(f"Created vector_embeddings table with vector({dimensions})")
-                        
-                        # Create indexes
-                        await conn.execute(text("CREATE INDEX idx_document_id ON vector_embeddings(document_id);"))
-                        
-                        # Create vector index
-                        await conn.execute(
-                            text(
-                                f"""
-                                CREATE INDEX vector_idx
-                                ON vector_embeddings
-                                USING ivfflat (embedding vector_cosine_ops)
-                                WITH (lists = 100);
-                                """
-                            )
-                        )
-                        logger.info("Created IVFFlat index on vector_embeddings")
-                    else:
-                        logger.info(f"Vector dimensions unchanged ({dimensions}), using existing table")
-                else:
-                    # Create tables and indexes if they don't exist
-                    create_table_sql = f"""
-                    CREATE TABLE vector_embeddings (
-                        id SERIAL PRIMARY KEY,
-                        document_id VARCHAR(255) NOT NULL,
-                        chunk_number INTEGER NOT NULL,
-                        content TEXT NOT NULL,
-                        chunk_metadata TEXT,
-                        embedding vector({dimensions}) NOT NULL,
-                        created_at TIMESTAMP WITH TIME ZONE DEFAULT CURRENT_TIMESTAMP
-                    );
-                    """
-                    await conn.execute(text(create_table_sql))
-                    logger.info(f"Created vector_embeddings table with vector({dimensions})")
-                    
-                    # Create indexes
-                    await conn.execute(text("CREATE INDEX idx_document_id ON vector_embeddings(document_id);"))
-                    
-                    # Create vector index
+                    AND NOT a.attisdropped
+                    AND t.typname IN ('vector', 'halfvec')
+                ) col ON true
+                WHERE e.extname = 'vector'
+                """
+            )
+        )
+        extversion, current_dim, current_type = result.one()
+
+        self.pgvector_version = tuple(int(part) for part in re.findall(r"\d+", extversion or "0"))
+        if self.use_halfvec and self.pgvector_version >= HALFVEC_MIN_PGVECTOR_VERSION:
+            self.embedding_type = "halfvec"
+        logger.info(f"Enabled pgvector extension, storing embeddings as {self.embedding_type}")
+
+        create_table_sql = f"""
+        CREATE TABLE vector_embeddings (
+            id SERIAL PRIMARY KEY,
+            document_id VARCHAR(255) NOT NULL,
+            chunk_number INTEGER NOT NULL,
+            content TEXT NOT NULL,
+            chunk_metadata JSONB,
+            embedding {self.embedding_type}({dimensions}) NOT NULL,
+            created_at TIMESTAMP WITH TIME ZONE DEFAULT CURRENT_TIMESTAMP
+        );
+        """
+
+        if current_type is not None:
+            if current_dim != dimensions:
+                if dimension_change_policy != "recreate":
+                    raise ValueError(
+                        f"Vector dimensions changed from {current_dim} to {dimensions}. Recreating "
+                        "the vector_embeddings table deletes all existing vector data; set "
+                        '[vector_store].dimension_change_policy = "recreate" to allow it.'
+                    )
+
+                logger.warning(
+                    f"Vector dimensions changed from {current_dim} to {dimensions}. "
+                    "Recreating tables and deleting all existing vector data."
+                )
+
+                # Drop existing vector index if it exists
+                await conn.execute(text("DROP INDEX IF EXISTS vector_idx;"))
+
+                # Drop existing vector embeddings table
+                await conn.execute(text("DROP TABLE IF EXISTS vector_embeddings;"))
+
+                # Create vector embeddings table with proper vector column
+                await conn.execute(text(create_table_sql))
+                logger.info(
+                    f"Created vector_embeddings table with {self.embedding_type}({dimensions})"
+                )
+            else:
+                logger.info(f"Vector dimensions unchanged ({dimensions}), using existing table")
+                if current_type != self.embedding_type and not (
+                    convert_to_halfvec and self.embedding_type == "halfvec"
+                ):
+                    logger.info(
+                        f"Keeping vector_embeddings.embedding as {current_type}; set "
+                        "[vector_store].convert_to_halfvec = true to "
+                        f"convert it to {self.embedding_type}"
+                    )
+                    self.embedding_type = current_type
+                if current_type != self.embedding_type:
+                    # The index is rebuilt for the new type by _ensure_vector_index below
+                    logger.info(
+                        "Converting vector_embeddings.embedding from "
+                        f"{current_type} to {self.embedding_type}"
+                    )
+                    await conn.execute(text("DROP INDEX IF EXISTS vector_idx;"))
                     await conn.execute(
                         text(
-                            f"""
-                            CREATE INDEX vector_idx
-                            ON vector_embeddings
-                            USING ivfflat (embedding vector_cosine_ops)
-                            WITH (lists = 100);
-                            """
+                            f"ALTER TABLE vector_embeddings ALTER COLUMN embedding "
+                            f"TYPE {self.embedding_type}({dimensions}) "
+                            f"USING embedding::{self.embedding_type}({dimensions});"
                         )
                     )
-                    logger.info("Created IVFFlat index on vector_embeddings")
+                await self._migrate_text_metadata(conn)
+        else:
+            # Create tables and indexes if they don't exist
+            await conn.execute(text(create_table_sql))
+            logger.info(f"Created vector_embeddings table with {self.embedding_type}({dimensions})")
 
-            logger.info("PGVector store initialized successfully")
+        # Create or upgrade the vector index
+        await self._ensure_vector_index(conn)
+
+        # Composite index serves document_id filters (as its prefix) and the
+        # (document_id, chunk_number) join in get_chunks_by_id
+        await conn.execute(
+            text(
+                "CREATE INDEX IF NOT EXISTS idx_vector_doc_chunk "
+                "ON vector_embeddings(document_id, chunk_number);"
+            )
+        )
+        await conn.execute(text("DROP INDEX IF EXISTS idx_document_id;"))
+
+    async def _ensure_vector_index(self, conn) -> None:
+        """Create vector_idx, or rebuild it when it is not the index this store expects.
+
+        HNSW (cosine, over the configured embedding type) is used when pgvector
+        supports it. Otherwise an IVFFlat index is built with lists sized from the
+        current row count.
+        """
+        use_hnsw = self.pgvector_version >= HNSW_MIN_PGVECTOR_VERSION
+        ops = f"{self.embedding_type}_cosine_ops"
+
+        result = await conn.execute(
+            text("SELECT indexdef FROM pg_indexes WHERE indexname = 'vector_idx'")
+        )
+        indexdef = result.scalar()
+        if indexdef and ops in indexdef:
+            if use_hnsw and "USING hnsw" in indexdef:
+                self.index_type = "hnsw"
+                return
+            lists = IVFFLAT_LISTS_PATTERN.search(indexdef)
+            if not use_hnsw and "USING ivfflat" in indexdef and lists:
+                self.index_type = "ivfflat"
+                self.ivfflat_lists = int(lists.group(1))
+                return
+
+        if indexdef:
+            logger.info(f"Rebuilding vector index, existing definition does not match: {indexdef}")
+            await conn.execute(text("DROP INDEX IF EXISTS vector_idx;"))
+
+        if use_hnsw:
+            await conn.execute(text(self._vector_index_sql("hnsw")))
+            self.index_type = "hnsw"
+            logger.info("Created HNSW index on vector_embeddings")
+        else:
+            result = await conn.execute(
+                text(
+                    "SELECT greatest(reltuples, 0)::bigint "
+                    "FROM pg_class WHERE relname = 'vector_embeddings'"
+                )
+            )
+            lists = _ivfflat_lists(result.scalar() or 0)
+            await conn.execute(text(self._vector_index_sql("ivfflat", lists)))
+            self.index_type = "ivfflat"
+            self.ivfflat_lists = lists
+            logger.info(f"Created IVFFlat index on vector_embeddings with {lists} lists")
+
+    def _vector_index_sql(self, index_type: str, lists: Optional[int] = None) -> str:
+        """CREATE INDEX statement for vector_idx of the given type over the embedding type."""
+        ops = f"{self.embedding_type}_cosine_ops"
+        if index_type == "hnsw":
+            return f"""
+                CREATE INDEX vector_idx
+                ON vector_embeddings
+                USING hnsw (embedding {ops})
+                WITH (m = {HNSW_M}, ef_construction = {HNSW_EF_CONSTRUCTION});
+            """
+        return f"""
+            CREATE INDEX vector_idx
+            ON vector_embeddings
+            USING ivfflat (embedding {ops})
+            WITH (lists = {lists});
+        """
+
+    def _search_parameters(self, k: int) -> Optional[Tuple[str, str]]:
+        """Setting and value tuning the vector index search for a top-k query, if any is needed."""
+        if self.index_type == "hnsw":
+            # HNSW returns at most ef_search rows, so it must be at least k (up to
+            # pgvector's limit; larger k then returns fewer rows instead of failing)
+            ef_search = min(max(self.hnsw_ef_search, k), HNSW_MAX_EF_SEARCH)
+            if ef_search != HNSW_DEFAULT_EF_SEARCH:
+                return "hnsw.ef_search", str(int(ef_search))
+        elif self.index_type == "ivfflat" and self.ivfflat_lists:
+            probes = self.ivfflat_probes or max(1, int(math.sqrt(self.ivfflat_lists)))
+            return "ivfflat.probes", str(probes)
+        return None
+
+    async def retune(self) -> bool:
+        """Resize the IVFFlat index to the current row count.
+
+        lists is sized from the row count when the index is built, so it drifts as
+        the table grows. This re-reads the lists of the live index (picking up a
+        rebuild done by another process) and rebuilds the index once the ideal
+        lists is more than IVFFLAT_RETUNE_FACTOR times away from it. HNSW needs
+        no tuning, so this is a no-op for it.
+
+        Returns:
+            bool: True if the index was rebuilt
+        """
+        if self.index_type != "ivfflat":
+            return False
+
+        try:
+            pool = await self.get_pool()
+            async with pool.acquire() as conn:
+                indexdef = await conn.fetchval(
+                    "SELECT indexdef FROM pg_indexes WHERE indexname = 'vector_idx'"
+                )
+                current = IVFFLAT_LISTS_PATTERN.search(indexdef or "")
+                if current:
+                    self.ivfflat_lists = int(current.group(1))
+
+                rows = await conn.fetchval(
+                    "SELECT greatest(reltuples, 0)::bigint "
+                    "FROM pg_class WHERE relname = 'vector_embeddings'"
+                )
+                lists = _ivfflat_lists(rows or 0)
+                if self.ivfflat_lists and (
+                    self.ivfflat_lists / IVFFLAT_RETUNE_FACTOR
+                    <= lists
+                    <= self.ivfflat_lists * IVFFLAT_RETUNE_FACTOR
+                ):
+                    return False
+
+                logger.info(
+                    f"Rebuilding IVFFlat index for {rows} rows: "
+                    f"lists {self.ivfflat_lists} -> {lists}"
+                )
+                async with conn.transaction():
+                    await conn.execute("DROP INDEX IF EXISTS vector_idx")
+                    await conn.execute(self._vector_index_sql("ivfflat", lists))
+
+            self.ivfflat_lists = lists
+            self._invalidate_query_cache()
             return True
+
         except Exception as e:
-            logger.error(f"Error initializing PGVector store: {str(e)}")
+            logger.error(f"Error retuning vector index: {str(e)}")
             return False
 
+    async def _migrate_text_metadata(self, conn) -> None:
+        """Convert a TEXT chunk_metadata column holding str(dict) values to JSONB.
+
+        The old values are Python reprs, so they are parsed with ast.literal_eval
+        rather than cast in SQL; values that cannot be parsed become {}.
+        """
+        result = await conn.execute(
+            text(
+                """
+                SELECT data_type FROM information_schema.columns
+                WHERE table_name = 'vector_embeddings' AND column_name = 'chunk_metadata'
+                """
+            )
+        )
+        if result.scalar() != "text":
+            return
+
+        logger.info("Migrating vector_embeddings.chunk_metadata from TEXT to JSONB")
+        await conn.execute(
+            text("ALTER TABLE vector_embeddings ADD COLUMN chunk_metadata_jsonb JSONB")
+        )
+        result = await conn.execute(
+            text(
+                "SELECT id, chunk_metadata FROM vector_embeddings WHERE chunk_metadata IS NOT NULL"
+            )
+        )
+
+        updates = []
+        for row_id, value in result.all():
+            try:
+                metadata = ast.literal_eval(value) if value else {}
+            except (ValueError, SyntaxError):
+                metadata = {}
+            if not isinstance(metadata, dict):
+                metadata = {}
+            updates.append({"id": row_id, "metadata": _dump_json(metadata).decode()})
+
+        if updates:
+            await conn.execute(
+                text(
+                    "UPDATE vector_embeddings SET chunk_metadata_jsonb = CAST(:metadata AS JSONB) "
+                    "WHERE id = :id"
+                ),
+                updates,
+            )
+        await conn.execute(text("ALTER TABLE vector_embeddings DROP COLUMN chunk_metadata"))
+        await conn.execute(
+            text(
+                "ALTER TABLE vector_embeddings RENAME COLUMN chunk_metadata_jsonb TO chunk_metadata"
+            )
+        )
+        logger.info(f"Migrated metadata of {len(updates)} chunks to JSONB")
+
     async def store_embeddings(self, chunks: List[DocumentChunk]) -> Tuple[bool, List[str]]:
-        """Store document chunks with their embeddings."""
+        """Store document chunks with their embeddings.
+
+        All rows are sent in one statement through asyncpg instead of one ORM insert
+        per chunk: an INSERT ... SELECT FROM unnest() of column arrays for small
+        batches, and a binary COPY from COPY_MIN_ROWS rows up.
+        """
         try:
             if not chunks:
                 return True, []
 
-            async with self.get_session_with_retry() as session:
-                stored_ids = []
-                for chunk in chunks:
-                    if not chunk.embedding:
-                        logger.error(
-                            f"Missing embedding for chunk {chunk.document_id}-{chunk.chunk_number}"
-                        )
-                        continue
-
-                    vector_embedding = VectorEmbedding(
-                        document_id=chunk.document_id,
-                        chunk_number=chunk.chunk_number,
-                        content=chunk.content,
-                        chunk_metadata=str(chunk.metadata),
-                        embedding=chunk.embedding,
-                    )
-                    session.add(vector_embedding)
-                    stored_ids.append(f"{chunk.document_id}-{chunk.chunk_number}")
+            rows, stored_ids = self._embedding_records(chunks)
+            if not rows:
+                return False, []
 
-                await session.commit()
-                return len(stored_ids) > 0, stored_ids
+            pool = await self.get_pool()
+            async with pool.acquire() as conn:
+                if len(rows) >= COPY_MIN_ROWS:
+                    await conn.copy_records_to_table(
+                        "vector_embeddings", records=rows, columns=VECTOR_EMBEDDING_COLUMNS
+                    )
+                else:
+                    document_ids, chunk_numbers, contents, metadata, embeddings = zip(*rows)
+                    await conn.execute(
+                        INSERT_EMBEDDINGS_SQL.format(embedding_type=self.embedding_type),
+                        list(document_ids),
+                        list(chunk_numbers),
+                        list(contents),
+                        list(metadata),
+                        _vector_array(embeddings),
+                    )
+            self._invalidate_query_cache()
+            return True, stored_ids
 
         except Exception as e:
             logger.error(f"Error storing embeddings: {str(e)}")
             return False, []
 
+    async def bulk_store_embeddings(
+        self, chunks: List[DocumentChunk], rebuild_index: bool = False
+    ) -> Tuple[bool, List[str]]:
+        """Store a large batch of chunks atomically, for initial loads and re-ingestion.
+
+        Rows are COPYed into a temporary (unlogged) staging table and moved into
+        vector_embeddings with one INSERT ... SELECT, all in a single transaction.
+        With rebuild_index, vector_idx is dropped before the insert and built once
+        afterwards, which is much faster than maintaining it row by row when the
+        batch is large relative to the table. The drop holds an exclusive lock on
+        the table until commit, so concurrent queries wait for the load.
+
+        Args:
+            chunks: Chunks with embeddings to store
+            rebuild_index: Drop and rebuild the vector index around the load
+
+        Returns:
+            Tuple of success and the ids of the stored chunks
+        """
+        try:
+            if not chunks:
+                return True, []
+
+            rows, stored_ids = self._embedding_records(chunks)
+            if not rows:
+                return False, []
+
+            # The index type is only known once initialize() has run
+            rebuild_index = rebuild_index and self.index_type is not None
+            columns = ", ".join(VECTOR_EMBEDDING_COLUMNS)
+            ivfflat_lists = self.ivfflat_lists
+
+            pool = await self.get_pool()
+            async with pool.acquire() as conn:
+                async with conn.transaction():
+                    await conn.execute(
+                        f"""
+                        CREATE TEMP TABLE staging_vector_embeddings ON COMMIT DROP AS
+                        SELECT {columns} FROM vector_embeddings WITH NO DATA
+                        """
+                    )
+                    await conn.copy_records_to_table(
+                        "staging_vector_embeddings", records=rows, columns=VECTOR_EMBEDDING_COLUMNS
+                    )
+                    if rebuild_index:
+                        await conn.execute("DROP INDEX IF EXISTS vector_idx")
+                    await conn.execute(
+                        f"INSERT INTO vector_embeddings ({columns}) "
+                        f"SELECT {columns} FROM staging_vector_embeddings"
+                    )
+                    if rebuild_index:
+                        if self.index_type == "ivfflat":
+                            ivfflat_lists = _ivfflat_lists(
+                                await conn.fetchval("SELECT count(*) FROM vector_embeddings")
+                            )
+                        await conn.execute(self._vector_index_sql(self.index_type, ivfflat_lists))
+
+            self.ivfflat_lists = ivfflat_lists
+            self._invalidate_query_cache()
+            logger.info(
+                f"Bulk stored {len(rows)} chunks"
+                f"{' and rebuilt vector_idx' if rebuild_index else ''}"
+            )
+            return True, stored_ids
+
+        except Exception as e:
+            logger.error(f"Error bulk storing embeddings: {str(e)}")
+            return False, []
+
+    @staticmethod
+    def _embedding_records(chunks: List[DocumentChunk]) -> Tuple[List[tuple], List[str]]:
+        """COPY records in VECTOR_EMBEDDING_COLUMNS order, skipping chunks without an embedding."""
+        rows = []
+        stored_ids = []
+        for chunk in chunks:
+            if chunk.embedding is None or len(chunk.embedding) == 0:
+                logger.error(
+                    f"Missing embedding for chunk {chunk.document_id}-{chunk.chunk_number}"
+                )
+                continue
+
+            rows.append(
+                (
+                    chunk.document_id,
+                    chunk.chunk_number,
+                    chunk.content,
+                    chunk.metadata,
+                    np.asarray(chunk.embedding, dtype=np.float32),
+                )
+            )
+            stored_ids.append(f"{chunk.document_id}-{chunk.chunk_number}")
+        return rows, stored_ids
+
+    def _query_cache_key(
+        self, query_embedding: List[float], k: int, doc_ids: Optional[List[str]]
+    ) -> tuple:
+        """Key a query_similar call on its embedding bytes, k, doc_ids and the write generation."""
+        digest = xxhash.xxh3_64_intdigest(np.asarray(query_embedding, dtype=np.float32).tobytes())
+        return (self._cache_generation, digest, k, tuple(sorted(doc_ids or ())))
+
+    def _get_cached_query(self, key: tuple) -> Optional[List[DocumentChunk]]:
+        """Return copies of cached results for a key, or None on a miss or expired entry."""
+        entry = self.query_cache.get(key)
+        if entry is None:
+            return None
+        cached_at, chunks = entry
+        if time.monotonic() - cached_at > self.query_cache_ttl:
+            del self.query_cache[key]
+            return None
+        self.query_cache.move_to_end(key)
+        # Callers overwrite scores during reranking, so never hand out the cached objects
+        return [chunk.model_copy() for chunk in chunks]
+
+    def _cache_query(self, key: tuple, chunks: List[DocumentChunk]) -> None:
+        """Cache query results, evicting the least recently used entries beyond the size limit."""
+        self.query_cache[key] = (time.monotonic(), [chunk.model_copy() for chunk in chunks])
+        self.query_cache.move_to_end(key)
+        while len(self.query_cache) > self.query_cache_size:
+            self.query_cache.popitem(last=False)
+
+    def _invalidate_query_cache(self) -> None:
+        """Drop cached query results after the stored chunks change."""
+        self._cache_generation += 1
+        self.query_cache.clear()
+
     async def query_similar(
         self,
         query_embedding: List[float],
@@ -342,126 +957,251 @@ class PGVectorStore(BaseVectorStore):
         doc_ids: Optional[List[str]] = None,
     ) -> List[DocumentChunk]:
         """Find similar chunks using cosine similarity."""
-        try:
-            async with self.get_session_with_retry() as session:
-                # Build query
-                query = select(VectorEmbedding).order_by(
-                    VectorEmbedding.embedding.op("<->")(query_embedding)
-                )
+        cache_key = None
+        if self.query_cache_size > 0:
+            cache_key = self._query_cache_key(query_embedding, k, doc_ids)
+            cached = self._get_cached_query(cache_key)
+            if cached is not None:
+                return cached
 
-                if doc_ids:
-                    query = query.filter(VectorEmbedding.document_id.in_(doc_ids))
-
-                query = query.limit(k)
-                result = await session.execute(query)
-                embeddings = result.scalars().all()
-
-                # Convert to DocumentChunks
-                chunks = []
-                for emb in embeddings:
-                    try:
-                        metadata = eval(emb.chunk_metadata) if emb.chunk_metadata else {}
-                    except (ValueError, SyntaxError):
-                        metadata = {}
-
-                    chunk = DocumentChunk(
-                        document_id=emb.document_id,
-                        chunk_number=emb.chunk_number,
-                        content=emb.content,
-                        embedding=[],  # Don't send embeddings back
-                        metadata=metadata,
-                    )
-                    chunks.append(chunk)
+        columns = await self.query_similar_columnar(query_embedding, k, doc_ids)
+        chunks = [
+            DocumentChunk(
+                document_id=document_id,
+                chunk_number=int(chunk_number),
+                content=content,
+                embedding=[],  # Don't send embeddings back
+                metadata=metadata or {},
+                score=float(score),  # Cosine similarity
+            )
+            for document_id, chunk_number, content, metadata, score in zip(
+                columns["document_ids"],
+                columns["chunk_numbers"],
+                columns["contents"],
+                columns["metadata"],
+                columns["scores"],
+            )
+        ]
+
+        # query_similar_columnar returns no rows when the query fails, so empty
+        # results are not cached
+        if cache_key is not None and chunks:
+            self._cache_query(cache_key, chunks)
+        return chunks
+
+    async def query_similar_columnar(
+        self,
+        query_embedding: List[float],
+        k: int,
+        doc_ids: Optional[List[str]] = None,
+    ) -> Dict[str, np.ndarray]:
+        """Find similar chunks and return them as columns instead of DocumentChunks.
 
-                return chunks
+        For callers that only rank or look up chunks by (document_id, chunk_number),
+        this avoids building a pydantic object per row. Rows are in descending score
+        order; query_similar builds its DocumentChunks from these columns.
 
+        Returns:
+            Dict of equally long arrays: document_ids, contents and metadata (object),
+            chunk_numbers (int32) and scores (float32, cosine similarity)
+        """
+        try:
+            rows = await self._fetch_similar(query_embedding, k, doc_ids)
         except Exception as e:
             logger.error(f"Error querying similar chunks: {str(e)}")
+            rows = []
+
+        n = len(rows)
+        document_ids = np.empty(n, dtype=object)
+        contents = np.empty(n, dtype=object)
+        metadata = np.empty(n, dtype=object)
+        document_ids[:] = [row["document_id"] for row in rows]
+        contents[:] = [row["content"] for row in rows]
+        metadata[:] = [row["chunk_metadata"] for row in rows]
+        return {
+            "document_ids": document_ids,
+            "chunk_numbers": np.fromiter(
+                (row["chunk_number"] for row in rows), dtype=np.int32, count=n
+            ),
+            "scores": np.fromiter((row["score"] for row in rows), dtype=np.float32, count=n),
+            "contents": contents,
+            "metadata": metadata,
+        }
+
+    async def _fetch_similar(
+        self, query_embedding: List[float], k: int, doc_ids: Optional[List[str]]
+    ) -> List[asyncpg.Record]:
+        """Run QUERY_SIMILAR_SQL with the index search tuned for k."""
+        params = (
+            np.asarray(query_embedding, dtype=np.float32),
+            k,
+            list(doc_ids) if doc_ids else None,
+        )
+
+        # Settings are applied transaction-locally so they never leak to other pool users
+        search_parameters = self._search_parameters(k)
+        pool = await self.get_pool()
+        async with pool.acquire() as conn:
+            if search_parameters:
+                async with conn.transaction():
+                    await conn.execute(SET_LOCAL_SQL, *search_parameters)
+                    return await conn.fetch(QUERY_SIMILAR_SQL, *params)
+            return await conn.fetch(QUERY_SIMILAR_SQL, *params)
+
+    async def query_similar_batch(
+        self,
+        query_embeddings: List[List[float]],
+        k: int,
+        doc_ids: Optional[List[str]] = None,
+    ) -> List[List[DocumentChunk]]:
+        """Find similar chunks for several queries with a single statement.
+
+        Each query is answered by its own index scan through a LATERAL join, so
+        the results match query_similar for every query while costing one round
+        trip for the whole batch.
+
+        Args:
+            query_embeddings: Query embeddings to search with
+            k: Number of chunks to return per query
+            doc_ids: Optional document IDs to restrict every query to
+
+        Returns:
+            One list of chunks per query embedding, in the same order
+        """
+        if not query_embeddings:
             return []
-            
+
+        try:
+            params = (
+                _vector_array(query_embeddings),
+                k,
+                list(doc_ids) if doc_ids else None,
+            )
+            query = QUERY_SIMILAR_BATCH_SQL.format(embedding_type=self.embedding_type)
+
+            search_parameters = self._search_parameters(k)
+            pool = await self.get_pool()
+            async with pool.acquire() as conn:
+                if search_parameters:
+                    async with conn.transaction():
+                        await conn.execute(SET_LOCAL_SQL, *search_parameters)
+                        rows = await conn.fetch(query, *params)
+                else:
+                    rows = await conn.fetch(query, *params)
+
+            # qid is the 1-based position of the query in the input
+            results: List[List[DocumentChunk]] = [[] for _ in query_embeddings]
+            for row in rows:
+                results[row["qid"] - 1].append(self._chunk_from_row(row))
+            return results
+
+        except Exception as e:
+            logger.error(
+                f"Error querying similar chunks for {len(query_embeddings)} queries: {str(e)}"
+            )
+            return [[] for _ in query_embeddings]
+
+    @staticmethod
+    def _chunk_from_row(row: asyncpg.Record) -> DocumentChunk:
+        """Build a scored DocumentChunk from a similarity query row."""
+        return DocumentChunk(
+            document_id=row["document_id"],
+            chunk_number=row["chunk_number"],
+            content=row["content"],
+            embedding=[],  # Don't send embeddings back
+            metadata=row["chunk_metadata"] or {},
+            score=float(row["score"]),  # Cosine similarity
+        )
+
     async def get_chunks_by_id(
         self,
         chunk_identifiers: List[Tuple[str, int]],
     ) -> List[DocumentChunk]:
         """
         Retrieve specific chunks by document ID and chunk number in a single database query.
-        
+
         Args:
             chunk_identifiers: List of (document_id, chunk_number) tuples
-            
+
         Returns:
             List of DocumentChunk objects
         """
         try:
             if not chunk_identifiers:
                 return []
-                
-            async with self.get_session_with_retry() as session:
-                # Create a list of OR conditions for the query
-                conditions = []
-                for doc_id, chunk_num in chunk_identifiers:
-                    conditions.append(
-                        text(f"(document_id = '{doc_id}' AND chunk_number = {chunk_num})")
-                    )
-                
-                # Join conditions with OR
-                or_condition = text(" OR ".join(f"({condition.text})" for condition in conditions))
-                
-                # Build query to find all matching chunks in a single query
-                query = select(VectorEmbedding).where(or_condition)
-                
-                logger.debug(f"Batch retrieving {len(chunk_identifiers)} chunks with a single query")
-                
-                # Execute query
-                result = await session.execute(query)
-                chunk_models = result.scalars().all()
-                
-                # Convert to DocumentChunk objects
-                chunks = []
-                for chunk_model in chunk_models:
-                    # Convert stored metadata string back to dict
-                    try:
-                        metadata = eval(chunk_model.chunk_metadata) if chunk_model.chunk_metadata else {}
-                    except Exception:
-                        metadata = {}
-                        
-                    chunk = DocumentChunk(
-                        document_id=chunk_model.document_id,
-                        chunk_number=chunk_model.chunk_number,
-                        content=chunk_model.content,
-                        embedding=[],  # Don't send embeddings back
-                        metadata=metadata,
-                        score=0.0,  # No relevance score for direct retrieval
-                    )
-                    chunks.append(chunk)
-                
-                logger.debug(f"Found {len(chunks)} chunks in batch retrieval")
-                return chunks
-                
+
+            # Pass the identifiers as two parallel arrays bound in the binary protocol
+            document_ids = [doc_id for doc_id, _ in chunk_identifiers]
+            chunk_numbers = [chunk_num for _, chunk_num in chunk_identifiers]
+
+            logger.debug(f"Batch retrieving {len(chunk_identifiers)} chunks with a single query")
+
+            pool = await self.get_pool()
+            async with pool.acquire() as conn:
+                rows = await conn.fetch(GET_CHUNKS_BY_ID_SQL, document_ids, chunk_numbers)
+
+            # Convert to DocumentChunk objects
+            chunks = []
+            for row in rows:
+                chunk = DocumentChunk(
+                    document_id=row["document_id"],
+                    chunk_number=row["chunk_number"],
+                    content=row["content"],
+                    embedding=[],  # Don't send embeddings back
+                    metadata=row["chunk_metadata"] or {},
+                    score=0.0,  # No relevance score for direct retrieval
+                )
+                chunks.append(chunk)
+
+            logger.debug(f"Found {len(chunks)} chunks in batch retrieval")
+            return chunks
+
         except Exception as e:
             logger.error(f"Error retrieving chunks by ID: {str(e)}")
             return []
-            
+
     async def delete_chunks_by_document_id(self, document_id: str) -> bool:
         """
         Delete all chunks associated with a document.
-        
+
         Args:
             document_id: ID of the document whose chunks should be deleted
-            
+
+        Returns:
+            bool: True if the operation was successful, False otherwise
+        """
+        return await self.delete_chunks_by_document_ids([document_id])
+
+    async def delete_chunks_by_document_ids(self, document_ids: List[str]) -> bool:
+        """
+        Delete all chunks associated with any of the given documents in one statement.
+
+        Args:
+            document_ids: IDs of the documents whose chunks should be deleted
+
         Returns:
             bool: True if the operation was successful, False otherwise
         """
+        if not document_ids:
+            return True
+
         try:
-            async with self.get_session_with_retry() as session:
-                # Delete all chunks for the specified document
-                query = text(f"DELETE FROM vector_embeddings WHERE document_id = :doc_id")
-                await session.execute(query, {"doc_id": document_id})
-                await session.commit()
-                
-                logger.info(f"Deleted all chunks for document {document_id}")
-                return True
-                
+            # Served by idx_vector_doc_chunk, which has document_id as its prefix
+            pool = await self.get_pool()
+            async with pool.acquire() as conn:
+                await conn.execute(DELETE_BY_DOCUMENT_IDS_SQL, list(document_ids))
+            self._invalidate_query_cache()
+
+            logger.info(f"Deleted all chunks for {len(document_ids)} documents")
+            return True
+
         except Exception as e:
-            logger.error(f"Error deleting chunks for document {document_id}: {str(e)}")
+            logger.error(f"Error deleting chunks for documents {document_ids}: {str(e)}")
             return False
+
+    async def close(self):
+        """Close the asyncpg pool and dispose of the SQLAlchemy engine."""
+        if self.pool is not None:
+            await self.pool.close()
+            self.pool = None
+        await self.engine.dispose()
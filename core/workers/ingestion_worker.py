@@ -330,12 +330,12 @@ async def startup(ctx):
     
     # Initialize vector store
     logger.info("Initializing primary vector store...")
-    vector_store = PGVectorStore(uri=settings.POSTGRES_URI)
-    success = await vector_store.initialize()
-    if success:
+    try:
+        vector_store = await PGVectorStore.create(uri=settings.POSTGRES_URI)
         logger.info("Primary vector store initialization successful")
-    else:
-        logger.error("Primary vector store initialization failed")
+    except Exception as e:
+        logger.error(f"Primary vector store initialization failed: {str(e)}")
+        raise
     ctx['vector_store'] = vector_store
     
     # Initialize storage
@@ -396,10 +396,15 @@ async def startup(ctx):
     if settings.ENABLE_COLPALI:
         logger.info("Initializing ColPali components...")
         colpali_embedding_model = ColpaliEmbeddingModel()
-        colpali_vector_store = MultiVectorStore(uri=settings.POSTGRES_URI)
+        # Share the API's query cache so chunks ingested here invalidate it
+        colpali_vector_store = MultiVectorStore(
+            uri=settings.POSTGRES_URI,
+            cache=ctx['redis'] if settings.REDIS_QUERY_CACHE_TTL > 0 else None,
+            cache_ttl=settings.REDIS_QUERY_CACHE_TTL,
+            prefilter_factor=settings.COLPALI_PREFILTER_FACTOR,
+        )
         # Properly await the initialization to ensure indexes are ready
-        # MultiVectorStore.initialize is synchronous, so we need to run it in a thread
-        success = await asyncio.to_thread(colpali_vector_store.initialize)
+        success = await colpali_vector_store.initialize()
         if success:
             logger.info("ColPali vector store initialization successful")
         else:
@@ -452,14 +457,14 @@ async def shutdown(ctx):
         await ctx['database'].engine.dispose()
     
     # Close vector store connections if they exist
-    if 'vector_store' in ctx and hasattr(ctx['vector_store'], 'engine'):
+    if ctx.get('vector_store') and hasattr(ctx['vector_store'], 'close'):
         logger.info("Closing vector store connections...")
-        await ctx['vector_store'].engine.dispose()
+        await ctx['vector_store'].close()
     
     # Close colpali vector store connections if they exist
-    if 'colpali_vector_store' in ctx and hasattr(ctx['colpali_vector_store'], 'engine'):
+    if ctx.get('colpali_vector_store') and hasattr(ctx['colpali_vector_store'], 'close'):
         logger.info("Closing colpali vector store connections...")
-        await ctx['colpali_vector_store'].engine.dispose()
+        await ctx['colpali_vector_store'].close()
     
     # Close any other open connections or resources that need cleanup
     logger.info("Worker shutdown complete.")
@@ -593,6 +598,7 @@ class WorkerSettings:
         if vector_store and hasattr(vector_store, 'async_session'):
             try:
                 async with vector_store.get_session_with_retry() as session:
+                    await session.execute(text("SELECT 1"))
                     logger.debug("Vector store connection is healthy")
             except Exception as e:
                 logger.error(f"Vector store connection test failed: {str(e)}")
\ No newline at end of file
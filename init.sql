@@ -26,11 +26,14 @@ CREATE TABLE IF NOT EXISTS vector_embeddings (
     document_id VARCHAR(255),
     chunk_number INTEGER,
     content TEXT,
-    chunk_metadata TEXT,
-    embedding vector(768),
+    chunk_metadata JSONB,
+    embedding halfvec(768),
     created_at TIMESTAMP WITH TIME ZONE DEFAULT CURRENT_TIMESTAMP
 );
 
+-- Create index for (document_id, chunk_number) lookups
+CREATE INDEX IF NOT EXISTS idx_vector_doc_chunk ON vector_embeddings(document_id, chunk_number);
+
 -- Create caches table
 CREATE TABLE IF NOT EXISTS caches (
     name TEXT PRIMARY KEY,
@@ -41,35 +44,42 @@ CREATE TABLE IF NOT EXISTS caches (
 
 -- Create vector index
 CREATE INDEX IF NOT EXISTS vector_idx
-ON vector_embeddings USING ivfflat (embedding vector_l2_ops)
-WITH (lists = 100);
+ON vector_embeddings USING hnsw (embedding halfvec_cosine_ops)
+WITH (m = 16, ef_construction = 64);
 
 -- Initialize multi-vector embeddings table for new multi-vector functionality.
+-- Each row stores all binary-quantized tokens of a chunk back to back in one BYTEA.
 CREATE TABLE IF NOT EXISTS multi_vector_embeddings (
     id BIGSERIAL PRIMARY KEY,
-    embeddings BIT(128)[]
+    embeddings BYTEA,
+    num_tokens INTEGER,
+    token_summary BYTEA
 );
 
 -- Create function for multi-vector similarity computation
-CREATE OR REPLACE FUNCTION max_sim(document bit[], query bit[]) RETURNS double precision AS $$
+CREATE OR REPLACE FUNCTION max_sim(document bytea, query bytea, token_bytes integer) RETURNS double precision AS $$
     WITH queries AS (
-        SELECT row_number() OVER () AS query_number, *
-        FROM (SELECT unnest(query) AS query) AS foo
+        SELECT
+            query_number,
+            ('x' || encode(substring(query FROM query_number * token_bytes + 1 FOR token_bytes), 'hex'))::varbit AS query
+        FROM generate_series(0, octet_length(query) / token_bytes - 1) AS query_number
     ),
     documents AS (
-        SELECT unnest(document) AS document
+        SELECT
+            ('x' || encode(substring(document FROM document_number * token_bytes + 1 FOR token_bytes), 'hex'))::varbit AS document
+        FROM generate_series(0, octet_length(document) / token_bytes - 1) AS document_number
     ),
     similarities AS (
         SELECT 
             query_number, 
-            1.0 - (bit_count(document # query)::float / greatest(bit_length(query), 1)::float) AS similarity
+            1.0 - (bit_count(document # query)::float / greatest(token_bytes * 8, 1)::float) AS similarity
         FROM queries CROSS JOIN documents
     ),
     max_similarities AS (
         SELECT MAX(similarity) AS max_similarity FROM similarities GROUP BY query_number
     )
     SELECT SUM(max_similarity) FROM max_similarities;
-$$ LANGUAGE SQL;
+$$ LANGUAGE SQL IMMUTABLE STRICT PARALLEL SAFE COST 1000;
 
 -- Create graphs table for knowledge graph functionality
 CREATE TABLE IF NOT EXISTS graphs (
@@ -0,0 +1,7 @@
+\echo Use "CREATE EXTENSION morphik_max_sim" to load this file. \quit
+
+-- Same result as the SQL max_sim(bit[], bit[]) function: for every query token,
+-- take the best 1 - hamming / bits similarity over all document tokens and sum.
+CREATE FUNCTION max_sim_bin(document bit[], query bit[]) RETURNS double precision
+AS 'MODULE_PATHNAME', 'max_sim_bin'
+LANGUAGE C IMMUTABLE STRICT PARALLEL SAFE;
@@ -0,0 +1,5 @@
+\echo Use "ALTER EXTENSION morphik_max_sim UPDATE TO '1.2'" to load this file. \quit
+
+CREATE FUNCTION max_sim_bin(document bytea, query bytea, token_bytes integer, document_tokens integer) RETURNS double precision
+AS 'MODULE_PATHNAME', 'max_sim_bin_packed'
+LANGUAGE C IMMUTABLE STRICT PARALLEL SAFE;
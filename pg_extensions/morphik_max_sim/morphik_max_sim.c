@@ -0,0 +1,290 @@
+/*
+ * morphik_max_sim
+ *
+ * ColBERT/ColPali style MaxSim scoring over binary-quantized token embeddings.
+ * Every document and query token is a bit string; similarity between two tokens
+ * is 1 - hamming(d, q) / bits(q).  The score of a document is the sum, over all
+ * query tokens, of the best similarity against any document token.
+ *
+ * This is the same computation as the SQL max_sim() function created by
+ * MultiVectorStore, but runs as a tight xor + popcount loop instead of an
+ * unnest x unnest cross join evaluated by the executor.
+ *
+ * Two entry points are provided: max_sim_bin(bit[], bit[]) for the original
+ * BIT(n)[] storage, and max_sim_bin(bytea, bytea, token_bytes[, document_tokens])
+ * for the packed layout where all tokens of a chunk are stored back to back in one
+ * bytea.
+ *
+ * The scoring loop is compiled several times on x86-64: for the build's baseline
+ * ISA, with the POPCNT instruction, and with AVX-512 VPOPCNTDQ.  _PG_init picks
+ * the best one the CPU supports, so a portable build (no -march) still gets
+ * hardware popcount instead of the compiler's software fallback.
+ */
+#include "postgres.h"
+
+#include <string.h>
+
+#include "fmgr.h"
+#include "utils/array.h"
+#include "utils/lsyscache.h"
+#include "utils/varbit.h"
+
+#if defined(__x86_64__) && defined(__GNUC__)
+#include <immintrin.h>
+#define MAX_SIM_X86_DISPATCH
+#endif
+
+PG_MODULE_MAGIC;
+
+typedef struct
+{
+	const uint8 *data;
+	int			bits;
+} BitToken;
+
+typedef double (*max_sim_kernel_fn) (const BitToken *doc_tokens, int n_doc,
+									 const BitToken *query_tokens, int n_query);
+
+/*
+ * Number of differing bits between two equally sized packed buffers, 8 bytes at
+ * a time.  Always inlined so that it is compiled with the target ISA of each
+ * kernel below.
+ */
+static pg_attribute_always_inline uint64
+xor_popcount_words(const uint8 *a, const uint8 *b, int i, int nbytes)
+{
+	uint64		count = 0;
+
+	for (; i + 8 <= nbytes; i += 8)
+	{
+		uint64		x;
+		uint64		y;
+
+		memcpy(&x, a + i, sizeof(uint64));
+		memcpy(&y, b + i, sizeof(uint64));
+		count += __builtin_popcountll(x ^ y);
+	}
+	for (; i < nbytes; i++)
+		count += __builtin_popcount((unsigned int) (a[i] ^ b[i]));
+
+	return count;
+}
+
+#ifdef MAX_SIM_X86_DISPATCH
+#define MAX_SIM_TARGET_POPCNT __attribute__((target("popcnt")))
+#define MAX_SIM_TARGET_AVX512 __attribute__((target("popcnt,avx512f,avx512vl,avx512vpopcntdq")))
+
+/*
+ * Same as xor_popcount_words, but counting 16 bytes per step with VPOPCNTQ.
+ */
+static pg_attribute_always_inline MAX_SIM_TARGET_AVX512 uint64
+xor_popcount_avx512(const uint8 *a, const uint8 *b, int nbytes)
+{
+	__m128i		acc = _mm_setzero_si128();
+	int			i = 0;
+
+	for (; i + 16 <= nbytes; i += 16)
+	{
+		__m128i		x = _mm_xor_si128(_mm_loadu_si128((const __m128i *) (a + i)),
+									  _mm_loadu_si128((const __m128i *) (b + i)));
+
+		acc = _mm_add_epi64(acc, _mm_popcnt_epi64(x));
+	}
+
+	return (uint64) _mm_extract_epi64(acc, 0) + (uint64) _mm_extract_epi64(acc, 1) +
+		xor_popcount_words(a, b, i, nbytes);
+}
+#else
+#define MAX_SIM_TARGET_POPCNT
+#endif
+
+/*
+ * Defines a MaxSim kernel over already deconstructed tokens, using the given
+ * popcount expression and function attributes.  Document and query tokens must
+ * all have the same number of bits.
+ */
+#define DEFINE_MAX_SIM_KERNEL(name, attributes, popcount) \
+static attributes double \
+name(const BitToken *doc_tokens, int n_doc, const BitToken *query_tokens, int n_query) \
+{ \
+	double		total = 0.0; \
+\
+	for (int q = 0; q < n_query; q++) \
+	{ \
+		int			bits = query_tokens[q].bits; \
+		int			nbytes = (bits + BITS_PER_BYTE - 1) / BITS_PER_BYTE; \
+		uint64		best = PG_UINT64_MAX; \
+\
+		for (int d = 0; d < n_doc; d++) \
+		{ \
+			const uint8 *a = doc_tokens[d].data; \
+			const uint8 *b = query_tokens[q].data; \
+			uint64		distance; \
+\
+			if (doc_tokens[d].bits != bits) \
+				ereport(ERROR, \
+						(errcode(ERRCODE_STRING_DATA_LENGTH_MISMATCH), \
+						 errmsg("cannot XOR bit strings of different sizes"))); \
+\
+			distance = (popcount); \
+			if (distance < best) \
+			{ \
+				best = distance; \
+				if (best == 0) \
+					break; \
+			} \
+		} \
+\
+		total += 1.0 - ((double) best / (double) Max(bits, 1)); \
+	} \
+\
+	return total; \
+}
+
+DEFINE_MAX_SIM_KERNEL(max_sim_kernel_default, , xor_popcount_words(a, b, 0, nbytes))
+#ifdef MAX_SIM_X86_DISPATCH
+DEFINE_MAX_SIM_KERNEL(max_sim_kernel_popcnt, MAX_SIM_TARGET_POPCNT, xor_popcount_words(a, b, 0, nbytes))
+DEFINE_MAX_SIM_KERNEL(max_sim_kernel_avx512, MAX_SIM_TARGET_AVX512, xor_popcount_avx512(a, b, nbytes))
+#endif
+
+static max_sim_kernel_fn max_sim_kernel = max_sim_kernel_default;
+
+void		_PG_init(void);
+
+void
+_PG_init(void)
+{
+#ifdef MAX_SIM_X86_DISPATCH
+	__builtin_cpu_init();
+	if (__builtin_cpu_supports("avx512vpopcntdq") && __builtin_cpu_supports("avx512vl"))
+		max_sim_kernel = max_sim_kernel_avx512;
+	else if (__builtin_cpu_supports("popcnt"))
+		max_sim_kernel = max_sim_kernel_popcnt;
+#endif
+}
+
+/*
+ * Unpack a bit[] / varbit[] argument into a flat list of tokens pointing at the
+ * (already contiguous) varbit payloads.
+ */
+static BitToken *
+deconstruct_bit_array(ArrayType *array, int *ntokens)
+{
+	Oid			elemtype = ARR_ELEMTYPE(array);
+	int16		typlen;
+	bool		typbyval;
+	char		typalign;
+	Datum	   *elems;
+	bool	   *nulls;
+	BitToken   *tokens;
+	int			n;
+
+	get_typlenbyvalalign(elemtype, &typlen, &typbyval, &typalign);
+	deconstruct_array(array, elemtype, typlen, typbyval, typalign, &elems, &nulls, &n);
+
+	tokens = palloc(sizeof(BitToken) * Max(n, 1));
+	for (int i = 0; i < n; i++)
+	{
+		VarBit	   *v;
+
+		if (nulls[i])
+			ereport(ERROR,
+					(errcode(ERRCODE_NULL_VALUE_NOT_ALLOWED),
+					 errmsg("max_sim_bin does not accept NULL array elements")));
+
+		v = DatumGetVarBitP(elems[i]);
+		tokens[i].data = VARBITS(v);
+		tokens[i].bits = VARBITLEN(v);
+	}
+
+	*ntokens = n;
+	return tokens;
+}
+
+/*
+ * Split a packed buffer of token_bytes-wide tokens into a token list.
+ */
+static BitToken *
+split_packed_tokens(const uint8 *data, int ntokens, int token_bytes)
+{
+	BitToken   *tokens = palloc(sizeof(BitToken) * Max(ntokens, 1));
+
+	for (int i = 0; i < ntokens; i++)
+	{
+		tokens[i].data = data + (Size) i * token_bytes;
+		tokens[i].bits = token_bytes * BITS_PER_BYTE;
+	}
+
+	return tokens;
+}
+
+PG_FUNCTION_INFO_V1(max_sim_bin);
+
+Datum
+max_sim_bin(PG_FUNCTION_ARGS)
+{
+	ArrayType  *document = PG_GETARG_ARRAYTYPE_P(0);
+	ArrayType  *query = PG_GETARG_ARRAYTYPE_P(1);
+	BitToken   *doc_tokens;
+	BitToken   *query_tokens;
+	int			n_doc;
+	int			n_query;
+
+	doc_tokens = deconstruct_bit_array(document, &n_doc);
+	query_tokens = deconstruct_bit_array(query, &n_query);
+
+	/* Matches the SQL implementation, where SUM over no rows is NULL */
+	if (n_doc == 0 || n_query == 0)
+		PG_RETURN_NULL();
+
+	PG_RETURN_FLOAT8(max_sim_kernel(doc_tokens, n_doc, query_tokens, n_query));
+}
+
+PG_FUNCTION_INFO_V1(max_sim_bin_packed);
+
+Datum
+max_sim_bin_packed(PG_FUNCTION_ARGS)
+{
+	bytea	   *document = PG_GETARG_BYTEA_PP(0);
+	bytea	   *query = PG_GETARG_BYTEA_PP(1);
+	int32		token_bytes = PG_GETARG_INT32(2);
+	int			doc_len = VARSIZE_ANY_EXHDR(document);
+	int			query_len = VARSIZE_ANY_EXHDR(query);
+	int			n_doc;
+	int			n_query;
+
+	if (token_bytes <= 0)
+		ereport(ERROR,
+				(errcode(ERRCODE_INVALID_PARAMETER_VALUE),
+				 errmsg("token_bytes must be positive")));
+	if (doc_len % token_bytes != 0 || query_len % token_bytes != 0)
+		ereport(ERROR,
+				(errcode(ERRCODE_STRING_DATA_LENGTH_MISMATCH),
+				 errmsg("embedding length is not a multiple of token_bytes (%d)", token_bytes)));
+
+	/*
+	 * With the document's token count, a query of another dimension can be told
+	 * apart from one that merely divides the document length evenly.
+	 */
+	if (PG_NARGS() > 3)
+	{
+		int32		document_tokens = PG_GETARG_INT32(3);
+
+		if ((int64) document_tokens * token_bytes != doc_len)
+			ereport(ERROR,
+					(errcode(ERRCODE_STRING_DATA_LENGTH_MISMATCH),
+					 errmsg("cannot XOR bit strings of different sizes"),
+					 errdetail("Document has %d bytes for %d tokens, query tokens are %d bytes wide.",
+							   doc_len, document_tokens, token_bytes)));
+	}
+
+	n_doc = doc_len / token_bytes;
+	n_query = query_len / token_bytes;
+	if (n_doc == 0 || n_query == 0)
+		PG_RETURN_NULL();
+
+	PG_RETURN_FLOAT8(max_sim_kernel(split_packed_tokens((const uint8 *) VARDATA_ANY(document), n_doc, token_bytes),
+									n_doc,
+									split_packed_tokens((const uint8 *) VARDATA_ANY(query), n_query, token_bytes),
+									n_query));
+}